@@ -0,0 +1,91 @@
+"""Compara o backend exportado (ONNX Runtime / OpenVINO) com o PyTorch.
+
+Amostra quadros de um vídeo real (com pessoas), conta pessoas nos dois
+backends e mostra a diferença média por quadro e a velocidade de cada um.
+Sai com código 1 se a diferença média passar de --tolerance.
+
+Uso (na raiz do repositório):
+    python -m benchmarks.check_detector input/voo.mp4 --backend onnx --int8
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+
+def sample_frames(video_path, count):
+    """`count` quadros espaçados uniformemente ao longo do vídeo"""
+    cap = cv2.VideoCapture(video_path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for idx in np.linspace(0, max(0, total - 1), count).astype(int):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+        ret, frame = cap.read()
+        if ret:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+
+def timed_counts(count_fn, frames, batch_size):
+    started = time.perf_counter()
+    counts = []
+    for i in range(0, len(frames), batch_size):
+        counts += count_fn(frames[i:i + batch_size])
+    return np.asarray(counts), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("--backend", default="onnx", choices=["onnx", "openvino"])
+    parser.add_argument("--int8", action="store_true", help="usa o modelo quantizado")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="diferença média aceita (pessoas por quadro)")
+    args = parser.parse_args()
+
+    # a referência é sempre o caminho PyTorch, qualquer que seja o ambiente
+    os.environ["DETECTOR_BACKEND"] = "torch"
+    from core.intelligent_analysis import (
+        DETECT_IMGSZ, load_detector, people_scores_batch, prepare_detection_frame
+    )
+    from core.person_detector import load_exported_detector
+
+    frames = [prepare_detection_frame(f) for f in sample_frames(args.video, args.frames)]
+    if not frames:
+        print(f"❌ Nenhum quadro lido de {args.video}")
+        return 1
+
+    # carregar os dois modelos fora das medições
+    load_detector()
+    exported = load_exported_detector(args.backend, args.int8, imgsz=DETECT_IMGSZ)
+    if exported is None:
+        return 1
+
+    reference, torch_s = timed_counts(people_scores_batch, frames, args.batch)
+    counts, exported_s = timed_counts(exported.count_people, frames, args.batch)
+
+    diff = np.abs(counts - reference)
+    mean_diff = float(diff.mean())
+    print(f"🎞  {len(frames)} quadros, {int(reference.sum())} pessoas (PyTorch)")
+    print(f"   PyTorch: {len(frames) / torch_s:.1f} quadros/s")
+    print(f"   {args.backend}{' INT8' if args.int8 else ''}: {len(frames) / exported_s:.1f} quadros/s "
+          f"({torch_s / exported_s:.2f}x)")
+    print(f"   contagens iguais em {np.mean(diff == 0):.0%} dos quadros, "
+          f"diferença média {mean_diff:.3f} (máx. {int(diff.max())})")
+
+    if mean_diff > args.tolerance:
+        print(f"❌ Diferença acima da tolerância ({args.tolerance})")
+        return 1
+
+    print("✅ Contagens dentro da tolerância")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
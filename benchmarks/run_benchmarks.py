@@ -0,0 +1,248 @@
+"""Benchmark reprodutível do pipeline com filmagem sintética.
+
+Gera clipes determinísticos com fontes lavfi do ffmpeg (panorâmica, tremedeira,
+cortes secos, cena estática), mede cada etapa separadamente (tempo de parede,
+CPU própria + ffmpeg, quadros/s), salva o resultado em JSON e compara com um
+baseline salvo.
+
+Uso (na raiz do repositório):
+    python -m benchmarks.run_benchmarks                   # roda e compara
+    python -m benchmarks.run_benchmarks --save-baseline   # grava o baseline
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+FPS = 30
+
+# (nome, duração em segundos, cadeia lavfi)
+SYNTHETIC_CLIPS = [
+    # panorâmica lenta em 720p/25fps: força reencode na normalização
+    ("pan", 12,
+     "testsrc2=s=2560x720:r=25,crop=1280:720:x='min(t*80,1280)':y=0"),
+    # tremedeira: recorte oscilando em alta frequência
+    ("shake", 12,
+     f"testsrc2=s=2112x1224:r={FPS},crop=1920:1080:x='96+60*sin(t*31)':y='72+45*cos(t*23)'"),
+    # cena estática (hover): quadro fixo, deve ser acelerada 2x
+    ("hover", 12,
+     f"smptehdbars=s=1920x1080:r={FPS}"),
+]
+
+# cortes secos: segmentos de fontes diferentes concatenados
+CUT_SEGMENTS = [
+    f"testsrc=s=1920x1080:r={FPS}:d=3",
+    f"rgbtestsrc=s=1920x1080:r={FPS}:d=3",
+    f"testsrc2=s=1920x1080:r={FPS}:d=3,hue=h=120",
+    f"color=c=0x204060:s=1920x1080:r={FPS}:d=3",
+]
+
+
+def run(command):
+    subprocess.run(command, check=True, capture_output=True)
+
+
+def encode_args():
+    # uma thread: saída idêntica entre execuções
+    return ["-c:v", "libx264", "-preset", "ultrafast", "-threads", "1", "-pix_fmt", "yuv420p"]
+
+
+def generate_footage(folder):
+    """Cria os clipes sintéticos em `folder`; retorna o total de quadros a 30fps"""
+    os.makedirs(folder, exist_ok=True)
+    total_seconds = 0
+
+    for name, duration, source in SYNTHETIC_CLIPS:
+        run([
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "lavfi", "-i", source,
+            "-t", str(duration),
+            *encode_args(),
+            os.path.join(folder, f"{name}.mp4")
+        ])
+        total_seconds += duration
+
+    inputs = []
+    for source in CUT_SEGMENTS:
+        inputs += ["-f", "lavfi", "-i", source]
+    labels = "".join(f"[{i}:v]" for i in range(len(CUT_SEGMENTS)))
+    run([
+        "ffmpeg", "-y", "-v", "error",
+        *inputs,
+        "-filter_complex", f"{labels}concat=n={len(CUT_SEGMENTS)}:v=1:a=0[v]",
+        "-map", "[v]",
+        *encode_args(),
+        os.path.join(folder, "cuts.mp4")
+    ])
+    total_seconds += 3 * len(CUT_SEGMENTS)
+
+    return total_seconds * FPS
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    def measure(self, name, frames, fn, *args, **kwargs):
+        print(f"⏱  {name}…")
+        wall_start = time.perf_counter()
+        cpu_start = cpu_seconds()
+        result = fn(*args, **kwargs)
+        wall = time.perf_counter() - wall_start
+        cpu = cpu_seconds() - cpu_start
+
+        self.stages[name] = {
+            "wall_s": round(wall, 3),
+            "cpu_s": round(cpu, 3),
+            "frames": frames,
+            "fps": round(frames / wall, 2) if wall > 0 else 0.0,
+        }
+        print(f"   {wall:.2f}s parede | {cpu:.2f}s CPU | {self.stages[name]['fps']:.1f} quadros/s")
+        return result
+
+
+def run_pipeline(workdir):
+    """Executa cada etapa do pipeline sobre a filmagem sintética"""
+    # store de features isolado: a análise de passada única não pode reaproveitar cache
+    os.environ["FEATURE_STORE_FOLDER"] = os.path.join(workdir, "features")
+    # trace e caches na pasta de trabalho, não no repositório (lidos no import)
+    os.environ["TRACE_FILE"] = os.path.join(workdir, "trace.jsonl")
+    os.environ["CLIP_CACHE_FOLDER"] = os.path.join(workdir, "clip_cache")
+
+    import main
+    from core.camera_motion_analysis import analyze_camera_motion
+    from core.highlight_builder import build_highlight
+    from core.intelligent_analysis import analyze_scene, analyze_video, load_detector
+    from core.scene_detection import detect_scenes
+
+    input_folder = os.path.join(workdir, "input")
+    main.NORMALIZED_FOLDER = os.path.join(workdir, "normalized")
+    main.OUTPUT_FOLDER = os.path.join(workdir, "output")
+    os.makedirs(main.NORMALIZED_FOLDER, exist_ok=True)
+
+    print("🎞  Gerando filmagem sintética…")
+    frames = generate_footage(input_folder)
+
+    # carregar o YOLO fora das medições
+    load_detector()
+
+    timer = StageTimer()
+    normalized = timer.measure(
+        "normalize_video", frames,
+        lambda: [main.normalize_video(p) for p in main.list_inputs(input_folder)]
+    )
+
+    merged = os.path.join(workdir, "merged.mp4")
+    timer.measure("concatenate_all_videos", frames, main.concatenate_all_videos, normalized, merged)
+
+    scenes = timer.measure("detect_scenes", frames, detect_scenes, merged)
+    timer.measure("analyze_video", frames, analyze_video, merged)
+
+    scores = timer.measure(
+        "analyze_scene", frames,
+        lambda: [analyze_scene(merged, start, end) for start, end in scenes]
+    )
+    timer.measure(
+        "analyze_camera_motion", frames,
+        lambda: [analyze_camera_motion(merged, start, end) for start, end in scenes]
+    )
+
+    ranked = sorted(zip(scenes, scores), key=lambda x: x[1], reverse=True)
+    selected = [scene for scene, _ in ranked[:max(1, len(ranked) // 2)]]
+    selected_frames = int(sum(end - start for start, end in selected) * FPS)
+    timer.measure(
+        "build_highlight", selected_frames,
+        build_highlight, merged, selected, os.path.join(workdir, "highlight.mp4")
+    )
+
+    return {"frames": frames, "scenes": len(scenes)}, timer.stages
+
+
+def compare(stages, baseline, tolerance):
+    """Lista de regressões: etapas cujo tempo de parede passou do baseline + tolerância"""
+    regressions = []
+    for name, stage in stages.items():
+        reference = baseline.get("stages", {}).get(name)
+        if not reference or not reference["wall_s"]:
+            continue
+        ratio = stage["wall_s"] / reference["wall_s"]
+        flag = "❌" if ratio > 1 + tolerance else "✅"
+        print(f"{flag} {name}: {stage['wall_s']:.2f}s vs {reference['wall_s']:.2f}s ({ratio:.2f}x)")
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save-baseline", action="store_true", help="grava o resultado como baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.15, help="regressão aceita (0.15 = 15%%)")
+    parser.add_argument("--keep", action="store_true", help="não apaga a pasta de trabalho")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="droneautocuts_bench_")
+    try:
+        footage, stages = run_pipeline(workdir)
+    finally:
+        if args.keep:
+            print(f"📁 Pasta de trabalho mantida em {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "footage": footage,
+        "stages": stages,
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"💾 Resultado salvo em {result_path}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"📌 Baseline atualizado em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️  Sem baseline para comparar (use --save-baseline)")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(stages, baseline, args.tolerance)
+    if regressions:
+        print(f"⚠️  Regressão em: {', '.join(regressions)}")
+        return 1
+
+    print("✅ Sem regressões")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,112 @@
+import os
+
 import cv2
 import numpy as np
 
-def analyze_camera_motion(video_path, start, end):
+from core.decode_engine import ANALYSIS_WIDTH, FrameConsumer
+
+# "farneback": fluxo denso (média/desvio da magnitude por quadro)
+# "sparse": features rastreadas + transformação global por quadro; movimento =
+# velocidade suavizada da trajetória, tremedeira = resíduo de alta frequência
+CAMERA_MOTION_ESTIMATOR = os.getenv("CAMERA_MOTION_ESTIMATOR", "farneback")
+# janela (quadros) da média móvel que separa movimento intencional de tremedeira
+TRAJECTORY_SMOOTH_WINDOW = int(os.getenv("TRAJECTORY_SMOOTH_WINDOW", "15"))
+
+
+def frame_flow_stats(prev_gray, gray, scale=1.0):
+    """Média e desvio padrão da magnitude do fluxo óptico entre dois quadros.
+
+    `scale` converte a magnitude medida no proxy para pixels da resolução
+    original, mantendo os limiares (`cam_instability > 3`, `cam_motion < 0.8`).
+    """
+    flow = cv2.calcOpticalFlowFarneback(
+        prev_gray, gray,
+        None,
+        0.5, 3, 15, 3, 5, 1.2, 0
+    )
+
+    magnitude, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+
+    return np.mean(magnitude) * scale, np.std(magnitude) * scale
+
+
+def frame_global_motion(prev_gray, gray, scale=1.0):
+    """Translação global (dx, dy) entre dois quadros via features esparsas.
+
+    Rastreia cantos com Lucas-Kanade e ajusta uma similaridade com RANSAC,
+    então objetos em movimento e paralaxe viram outliers. Retorna NaN quando
+    não há textura suficiente (céu liso, quadro preto).
+    """
+    points = cv2.goodFeaturesToTrack(prev_gray, maxCorners=200, qualityLevel=0.01, minDistance=20)
+    if points is None or len(points) < 6:
+        return np.nan, np.nan
+
+    tracked, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None)
+    good = status.ravel() == 1
+    if np.count_nonzero(good) < 6:
+        return np.nan, np.nan
+
+    matrix, _ = cv2.estimateAffinePartial2D(
+        points[good], tracked[good], method=cv2.RANSAC, ransacReprojThreshold=3.0
+    )
+    if matrix is None:
+        return np.nan, np.nan
+
+    return matrix[0, 2] * scale, matrix[1, 2] * scale
+
+
+def moving_average(values, window):
+    """Média móvel centrada por coluna, com borda repetida"""
+    window = min(window, len(values))
+    if window <= 1:
+        return values.copy()
+    pad = window // 2
+    padded = np.pad(values, ((pad, window - 1 - pad), (0, 0)), mode="edge")
+    kernel = np.ones(window) / window
+    return np.stack(
+        [np.convolve(padded[:, i], kernel, mode="valid") for i in range(values.shape[1])],
+        axis=1,
+    )
+
+
+def motion_from_trajectory(dx, dy, window=TRAJECTORY_SMOOTH_WINDOW):
+    """(cam_motion, cam_instability) a partir dos deslocamentos por quadro.
+
+    Integra a trajetória da câmera, suaviza com média móvel e separa:
+    movimento = média da velocidade suavizada, tremedeira = média da variação
+    por quadro do resíduo (trajetória − suavizada). Ambos em px/quadro.
+    """
+    # quadros sem rastreio (NaN) contam como câmera parada
+    velocity = np.nan_to_num(np.stack([dx, dy], axis=1))
+    if len(velocity) < 2:
+        return 0, 0
+
+    trajectory = np.cumsum(velocity, axis=0)
+    smoothed = moving_average(trajectory, window)
+    residual = trajectory - smoothed
+
+    smooth_velocity = np.diff(smoothed, axis=0)
+    shake = np.diff(residual, axis=0)
+
+    return (
+        float(np.mean(np.linalg.norm(smooth_velocity, axis=1))),
+        float(np.mean(np.linalg.norm(shake, axis=1))),
+    )
+
+
+def to_analysis_gray(frame, analysis_width=ANALYSIS_WIDTH):
+    """Cinza reduzido para a largura de análise; retorna (gray, scale)"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    if not analysis_width or w <= analysis_width:
+        return gray, 1.0
+    proxy_height = int(round(h * analysis_width / w))
+    gray = cv2.resize(gray, (analysis_width, proxy_height), interpolation=cv2.INTER_AREA)
+    return gray, w / analysis_width
+
+
+def analyze_camera_motion(video_path, start, end, estimator=None):
+    estimator = estimator or CAMERA_MOTION_ESTIMATOR
     cap = cv2.VideoCapture(video_path)
     fps = cap.get(cv2.CAP_PROP_FPS)
 
@@ -12,7 +117,7 @@ def analyze_camera_motion(video_path, start, end):
         cap.release()
         return 0, 0
 
-    prev_gray = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
+    prev_gray, scale = to_analysis_gray(prev_frame)
 
     global_motion = []
     stability_score = []
@@ -22,18 +127,13 @@ def analyze_camera_motion(video_path, start, end):
         if not ret:
             break
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray, _ = to_analysis_gray(frame)
 
-        flow = cv2.calcOpticalFlowFarneback(
-            prev_gray, gray,
-            None,
-            0.5, 3, 15, 3, 5, 1.2, 0
-        )
-
-        magnitude, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
-
-        avg_motion = np.mean(magnitude)
-        std_motion = np.std(magnitude)
+        if estimator == "sparse":
+            # aqui as listas guardam dx e dy
+            avg_motion, std_motion = frame_global_motion(prev_gray, gray, scale)
+        else:
+            avg_motion, std_motion = frame_flow_stats(prev_gray, gray, scale)
 
         global_motion.append(avg_motion)
         stability_score.append(std_motion)
@@ -45,4 +145,177 @@ def analyze_camera_motion(video_path, start, end):
     if len(global_motion) == 0:
         return 0, 0
 
-    return np.mean(global_motion), np.mean(stability_score)
\ No newline at end of file
+    if estimator == "sparse":
+        return motion_from_trajectory(np.asarray(global_motion), np.asarray(stability_score))
+
+    return np.mean(global_motion), np.mean(stability_score)
+
+
+class SampledCameraMotion:
+    """Movimento de câmera a partir de quadros espaçados (amostras do analyze_scene).
+
+    Em cada amostra o fluxo é medido entre o quadro amostrado e o seguinte,
+    então fica em px/quadro como no `analyze_camera_motion` e a tremedeira
+    não se cancela ao longo do intervalo entre amostras. Cada amostra pesa
+    pelos quadros que representa. Evita decodificar a cena inteira de novo
+    só para o fluxo óptico.
+    """
+
+    def __init__(self, estimator=None, window=TRAJECTORY_SMOOTH_WINDOW):
+        self.estimator = estimator or CAMERA_MOTION_ESTIMATOR
+        self.window = window
+        self.motion = []
+        self.instability = []
+        self.weights = []
+
+    def add(self, frame, next_frame, weight=1):
+        """Fluxo entre `frame` e o quadro imediatamente seguinte"""
+        gray, scale = to_analysis_gray(frame)
+        next_gray, _ = to_analysis_gray(next_frame)
+        if self.estimator == "sparse":
+            # aqui as listas guardam dx e dy
+            motion, instability = frame_global_motion(gray, next_gray, scale)
+        else:
+            motion, instability = frame_flow_stats(gray, next_gray, scale)
+        self.motion.append(motion)
+        self.instability.append(instability)
+        self.weights.append(weight)
+
+    def result(self):
+        """(cam_motion, cam_instability) das amostras vistas até aqui"""
+        if not self.weights:
+            return 0, 0
+        if self.estimator == "sparse":
+            return self._sparse_result()
+        return (
+            float(np.average(self.motion, weights=self.weights)),
+            float(np.average(self.instability, weights=self.weights)),
+        )
+
+    def _sparse_result(self):
+        """Mesma separação do `motion_from_trajectory`, sobre as velocidades amostradas.
+
+        Lá a tremedeira por quadro é a velocidade menos a velocidade
+        suavizada; aqui a suavização é uma média móvel sobre as amostras que
+        cobre cerca de `window` quadros (no mínimo 5 amostras). Amostras isoladas
+        não distinguem tremedeira de uma panorâmica que muda de direção, então
+        parte da tremedeira também aparece no movimento.
+        """
+        velocity = np.nan_to_num(np.stack([self.motion, self.instability], axis=1))
+        weights = np.asarray(self.weights, dtype=np.float64)
+        if len(velocity) < 2:
+            return float(np.linalg.norm(velocity[0])), 0
+
+        samples = max(5, int(round(self.window / np.mean(weights))))
+        smooth_velocity = moving_average(velocity, samples)
+        shake = velocity - smooth_velocity
+        return (
+            float(np.average(np.linalg.norm(smooth_velocity, axis=1), weights=weights)),
+            float(np.average(np.linalg.norm(shake, axis=1), weights=weights)),
+        )
+
+
+class CameraMotionConsumer(FrameConsumer):
+    """Fluxo óptico quadro a quadro para o StreamingDecoder.
+
+    O valor do quadro i é o fluxo entre i-1 e i; no agregado o primeiro quadro
+    da cena é ignorado para não medir o fluxo através do corte.
+    """
+
+    def __init__(self):
+        self.prev_gray = None
+        self.scale = 1.0
+        self.flow_mean = []
+        self.flow_std = []
+
+    def start(self, fps, width, height, scale=1.0):
+        self.scale = scale
+
+    def process(self, frame_idx, frame, gray):
+        if self.prev_gray is None:
+            self.flow_mean.append(np.nan)
+            self.flow_std.append(np.nan)
+        else:
+            avg_motion, std_motion = frame_flow_stats(self.prev_gray, gray, self.scale)
+            self.flow_mean.append(avg_motion)
+            self.flow_std.append(std_motion)
+
+        self.prev_gray = gray
+
+    def finish(self, frame_count):
+        self.prev_gray = None
+        self.flow_mean = np.asarray(self.flow_mean, dtype=np.float64)
+        self.flow_std = np.asarray(self.flow_std, dtype=np.float64)
+
+    def columns(self):
+        return {"flow_mean": self.flow_mean, "flow_std": self.flow_std}
+
+    def load_columns(self, columns, frame_count):
+        self.flow_mean = columns["flow_mean"]
+        self.flow_std = columns["flow_std"]
+
+    def aggregate(self, start_frame, end_frame):
+        motion = self.flow_mean[start_frame + 1:end_frame]
+        instability = self.flow_std[start_frame + 1:end_frame]
+        motion = motion[~np.isnan(motion)]
+        instability = instability[~np.isnan(instability)]
+
+        if len(motion) == 0:
+            return {"cam_motion": 0, "cam_instability": 0}
+
+        return {
+            "cam_motion": float(np.mean(motion)),
+            "cam_instability": float(np.mean(instability)),
+        }
+
+
+class SparseCameraMotionConsumer(FrameConsumer):
+    """Deslocamento global por quadro (features esparsas) para o StreamingDecoder.
+
+    Guarda dx/dy por quadro; o agregado da cena monta a trajetória só com os
+    quadros da cena e devolve as mesmas chaves do CameraMotionConsumer.
+    """
+
+    def __init__(self):
+        self.prev_gray = None
+        self.scale = 1.0
+        self.track_dx = []
+        self.track_dy = []
+
+    def start(self, fps, width, height, scale=1.0):
+        self.scale = scale
+
+    def process(self, frame_idx, frame, gray):
+        if self.prev_gray is None:
+            dx, dy = np.nan, np.nan
+        else:
+            dx, dy = frame_global_motion(self.prev_gray, gray, self.scale)
+        self.track_dx.append(dx)
+        self.track_dy.append(dy)
+
+        self.prev_gray = gray
+
+    def finish(self, frame_count):
+        self.prev_gray = None
+        self.track_dx = np.asarray(self.track_dx, dtype=np.float64)
+        self.track_dy = np.asarray(self.track_dy, dtype=np.float64)
+
+    def columns(self):
+        return {"track_dx": self.track_dx, "track_dy": self.track_dy}
+
+    def load_columns(self, columns, frame_count):
+        self.track_dx = columns["track_dx"]
+        self.track_dy = columns["track_dy"]
+
+    def aggregate(self, start_frame, end_frame):
+        cam_motion, cam_instability = motion_from_trajectory(
+            self.track_dx[start_frame + 1:end_frame],
+            self.track_dy[start_frame + 1:end_frame],
+        )
+        return {"cam_motion": cam_motion, "cam_instability": cam_instability}
+
+
+def make_camera_motion_consumer(estimator=None):
+    if (estimator or CAMERA_MOTION_ESTIMATOR) == "sparse":
+        return SparseCameraMotionConsumer()
+    return CameraMotionConsumer()
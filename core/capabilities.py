@@ -0,0 +1,73 @@
+import json
+import os
+import socket
+import subprocess
+import threading
+
+# resultados de testes de hardware (nvenc, CUDA do YOLO) guardados por
+# host + versão da ferramenta; CAPABILITY_CACHE="" desativa o arquivo
+CAPABILITY_CACHE = os.getenv(
+    "CAPABILITY_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "droneautocuts", "capabilities.json")
+)
+
+_cache_lock = threading.Lock()
+_memory = {}
+
+
+def ffmpeg_version():
+    """Primeira linha do `ffmpeg -version` (muda quando o ffmpeg é trocado)"""
+    try:
+        proc = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return "unknown"
+    lines = proc.stdout.splitlines()
+    return lines[0] if lines else "unknown"
+
+
+def _read_cache():
+    try:
+        with open(CAPABILITY_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(cache):
+    os.makedirs(os.path.dirname(CAPABILITY_CACHE) or ".", exist_ok=True)
+    tmp_path = f"{CAPABILITY_CACHE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, CAPABILITY_CACHE)
+
+
+def cached_probe(name, version, probe, positive=bool):
+    """Roda `probe()` uma vez por (host, name, version) e reaproveita o resultado.
+
+    O valor precisa ser serializável em JSON. Fica em memória para o processo
+    e, se `positive(valor)`, em CAPABILITY_CACHE para os próximos processos
+    (workers, novas execuções). Resultados negativos podem ser transitórios
+    (timeout, GPU ocupada), então a próxima execução testa de novo.
+    """
+    key = f"{socket.gethostname()}|{name}|{version}"
+
+    with _cache_lock:
+        if key in _memory:
+            return _memory[key]
+
+        cache = _read_cache() if CAPABILITY_CACHE else {}
+        # negativos gravados por versões antigas são ignorados
+        if key in cache and positive(cache[key]):
+            _memory[key] = cache[key]
+            return cache[key]
+
+        value = probe()
+        _memory[key] = value
+        if CAPABILITY_CACHE and positive(value):
+            cache = _read_cache()
+            cache[key] = value
+            try:
+                _write_cache(cache)
+            except OSError as e:
+                print(f"⚠️  Não foi possível salvar {CAPABILITY_CACHE}: {e}")
+        return value
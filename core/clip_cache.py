@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+
+# clipes já renderizados (cortados, acelerados, com LUT e recorte), endereçados
+# pelo conteúdo; usados pelo RENDER_MODE=cached
+CLIP_CACHE_FOLDER = os.getenv("CLIP_CACHE_FOLDER", os.path.join("normalized", "clip_cache"))
+# tamanho máximo do cache; os clipes usados há mais tempo saem primeiro
+CLIP_CACHE_MAX_GB = float(os.getenv("CLIP_CACHE_MAX_GB", "20"))
+
+# mude ao alterar a forma como os clipes são gerados
+CLIP_CACHE_VERSION = 1
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def clip_key(source_fingerprint, clip, encoder, lut_hash, fmt, with_audio):
+    """Hash de tudo que muda os bytes do clipe renderizado"""
+    fields = {
+        "version": CLIP_CACHE_VERSION,
+        "source": source_fingerprint,
+        "start": round(clip["local_start"], 3),
+        "duration": round(clip["duration"], 3),
+        "speed": clip["speed"],
+        "encoder": encoder,
+        "lut": lut_hash,
+        "format": fmt,
+        "audio": with_audio,
+    }
+    # o recorte só depende da trilha nas versões não 16:9
+    if fmt != "16:9":
+        fields["subject_x"] = clip.get("subject_x")
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+
+def cached_clip_path(key, folder=CLIP_CACHE_FOLDER):
+    return os.path.join(folder, f"{key}.mp4")
+
+
+def lookup(path):
+    """True se o clipe está no cache; atualiza a data de uso (LRU)"""
+    if not os.path.exists(path):
+        return False
+    os.utime(path)
+    return True
+
+
+def evict(keep=(), folder=CLIP_CACHE_FOLDER, max_bytes=None):
+    """Remove os clipes usados há mais tempo até o cache caber em `max_bytes`.
+
+    Os caminhos em `keep` (clipes do render atual) nunca são removidos.
+    """
+    if max_bytes is None:
+        max_bytes = CLIP_CACHE_MAX_GB * 1024 ** 3
+    if not os.path.isdir(folder):
+        return
+
+    entries = []
+    for name in os.listdir(folder):
+        if not name.endswith(".mp4"):
+            continue
+        path = os.path.join(folder, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    keep = {os.path.abspath(p) for p in keep}
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        evicted += 1
+
+    if evicted:
+        print(f"🧹 Cache de clipes: {evicted} clipe(s) antigos removidos ({total / 1024 ** 3:.1f} GB)")
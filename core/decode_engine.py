@@ -0,0 +1,178 @@
+import os
+import subprocess
+
+import cv2
+import numpy as np
+
+from core.resources import ffmpeg_thread_args
+
+# largura do proxy de análise (0 = resolução original). Com proxy o vídeo é
+# decodificado já reduzido por um pipe do ffmpeg; métricas e fluxo óptico
+# rodam nessa resolução
+ANALYSIS_WIDTH = int(os.getenv("ANALYSIS_WIDTH", "0"))
+
+
+class FrameConsumer:
+    """Consumidor registrado no StreamingDecoder.
+
+    Recebe cada quadro decodificado uma única vez (BGR + cinza já convertido),
+    guarda valores por quadro e, ao final, reduz esses valores para o
+    intervalo de quadros de cada cena em `aggregate`.
+    """
+
+    def start(self, fps, width, height, scale=1.0):
+        """`scale` = largura original / largura decodificada (1.0 sem proxy)"""
+        pass
+
+    def process(self, frame_idx, frame, gray):
+        pass
+
+    def finish(self, frame_count):
+        pass
+
+    def aggregate(self, start_frame, end_frame):
+        return {}
+
+    def columns(self):
+        """Valores por quadro (um array por coluna, tamanho = total de quadros)"""
+        return {}
+
+    def load_columns(self, columns, frame_count):
+        """Restaura o estado de `finish` a partir de colunas salvas"""
+        pass
+
+
+def proxy_size(width, height, analysis_width=ANALYSIS_WIDTH):
+    """Tamanho (par) do proxy de análise ou o original se não houver redução"""
+    if not analysis_width or width <= analysis_width:
+        return width, height
+    proxy_height = int(round(height * analysis_width / width / 2)) * 2
+    return analysis_width, proxy_height
+
+
+def read_frames_cv2(cap):
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame
+
+
+def read_frames_ffmpeg(video_path, width, height):
+    """Quadros BGR já reduzidos para (width, height) via pipe rawvideo do ffmpeg"""
+    command = [
+        "ffmpeg",
+        "-v", "error",
+        *ffmpeg_thread_args(),
+        "-i", video_path,
+        "-vf", f"scale={width}:{height}:flags=area",
+        "-vsync", "0",
+        "-f", "rawvideo",
+        "-pix_fmt", "bgr24",
+        "-"
+    ]
+    frame_size = width * height * 3
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=frame_size * 4)
+    try:
+        while True:
+            buf = proc.stdout.read(frame_size)
+            if len(buf) < frame_size:
+                break
+            yield np.frombuffer(buf, dtype=np.uint8).reshape(height, width, 3)
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+
+class StreamingDecoder:
+    """Decodifica o vídeo uma única vez e repassa cada quadro aos consumidores.
+
+    Evita abrir um `cv2.VideoCapture` por cena e os seeks com
+    `CAP_PROP_POS_FRAMES`; as métricas por cena saem de `aggregate`.
+    """
+
+    def __init__(self, video_path, analysis_width=ANALYSIS_WIDTH):
+        self.video_path = video_path
+        self.analysis_width = analysis_width
+        self.consumers = []
+        self.fps = 0.0
+        self.frame_count = 0
+
+    def register(self, consumer):
+        self.consumers.append(consumer)
+        return consumer
+
+    def run(self):
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            raise RuntimeError(f"Não foi possível abrir o vídeo: {self.video_path}")
+
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        proxy_width, proxy_height = proxy_size(width, height, self.analysis_width)
+        scale = width / proxy_width if proxy_width else 1.0
+
+        if (proxy_width, proxy_height) != (width, height):
+            cap.release()
+            print(f"📼 Decodificando {self.video_path} em proxy {proxy_width}x{proxy_height} ({len(self.consumers)} consumidores)")
+            frames = read_frames_ffmpeg(self.video_path, proxy_width, proxy_height)
+        else:
+            print(f"📼 Decodificando {self.video_path} uma única vez ({len(self.consumers)} consumidores)")
+            frames = read_frames_cv2(cap)
+
+        for consumer in self.consumers:
+            consumer.start(self.fps, proxy_width, proxy_height, scale)
+
+        frame_idx = 0
+        for frame in frames:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            for consumer in self.consumers:
+                consumer.process(frame_idx, frame, gray)
+
+            frame_idx += 1
+
+        cap.release()
+
+        self.frame_count = frame_idx
+        for consumer in self.consumers:
+            consumer.finish(frame_idx)
+
+        print(f"✔ {frame_idx} quadros decodificados")
+        return frame_idx
+
+    def frame_range(self, start, end):
+        start_frame = int(round(start * self.fps))
+        end_frame = min(int(round(end * self.fps)), self.frame_count)
+        return start_frame, max(start_frame, end_frame)
+
+    def columns(self):
+        columns = {"timestamp": np.arange(self.frame_count, dtype=np.float64) / self.fps}
+        for consumer in self.consumers:
+            columns.update(consumer.columns())
+        return columns
+
+    def restore(self, fps, frame_count, columns):
+        """Recarrega os consumidores a partir de colunas salvas, sem decodificar"""
+        self.fps = fps
+        self.frame_count = frame_count
+        for consumer in self.consumers:
+            consumer.load_columns(columns, frame_count)
+
+    def aggregate(self, scenes):
+        """Lista de dicts com os agregados de todos os consumidores por cena"""
+        results = []
+        for start, end in scenes:
+            start_frame, end_frame = self.frame_range(start, end)
+            stats = {
+                "start": start,
+                "end": end,
+                "frames": end_frame - start_frame,
+            }
+            for consumer in self.consumers:
+                stats.update(consumer.aggregate(start_frame, end_frame))
+            results.append(stats)
+        return results
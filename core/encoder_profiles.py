@@ -0,0 +1,122 @@
+import os
+import re
+import subprocess
+import tempfile
+import time
+from functools import lru_cache
+
+from core.capabilities import cached_probe, ffmpeg_version
+from core.resources import encoder_thread_args, ffmpeg_thread_args
+from core.telemetry import emit
+
+# perfis de encode por etapa: "intermediate" para arquivos que só existem para
+# serem decodificados de novo (normalizados, clipes temporários, merged_raw),
+# "final" para o que é entregue (highlight, versões verticais, cache de clipes).
+# Os normalizados são a origem dos cortes finais, por isso o intermediário é
+# quase sem perdas (CRF baixo) e só economiza no preset.
+FINAL_PRESET = os.getenv("FINAL_PRESET", "slow")
+FINAL_CRF = os.getenv("FINAL_CRF", "18")
+# "auto": escolhe o preset do libx264 medindo num trecho curto (uma vez por host)
+INTERMEDIATE_PRESET = os.getenv("INTERMEDIATE_PRESET", "auto")
+INTERMEDIATE_CRF = os.getenv("INTERMEDIATE_CRF", "14")
+NVENC_FINAL_CQ = "18"
+NVENC_INTERMEDIATE_CQ = "16"
+
+# autotune: presets candidatos (do mais rápido ao mais lento), quadros por
+# segundo mínimos e SSIM mínimo contra a amostra
+AUTOTUNE_PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium"]
+AUTOTUNE_MIN_FPS = float(os.getenv("AUTOTUNE_MIN_FPS", "120"))
+AUTOTUNE_MIN_SSIM = float(os.getenv("AUTOTUNE_MIN_SSIM", "0.98"))
+AUTOTUNE_SECONDS = 2
+AUTOTUNE_FALLBACK = "veryfast"
+# amostra sintética 1080p30 com ruído: mesma para qualquer filmagem, então o
+# resultado vale para o host inteiro
+AUTOTUNE_SOURCE = "testsrc2=size=1920x1080:rate=30,noise=alls=8:allf=t"
+
+_SSIM_RE = re.compile(r"All:([0-9.]+)")
+
+
+def encoding_args(codec, profile="final"):
+    """Argumentos de encoding do codec para o perfil ("final" ou "intermediate")"""
+    if codec == "h264_nvenc":
+        # NVENC não suporta -crf, usa -rc vbr (variable bitrate) com -cq (quality)
+        if profile == "intermediate":
+            return ["-rc", "vbr", "-cq", NVENC_INTERMEDIATE_CQ, "-preset", "fast"]
+        return ["-rc", "vbr", "-cq", NVENC_FINAL_CQ, "-preset", "slow"]
+
+    # libx264 usa -crf (constant rate factor)
+    if profile == "intermediate":
+        return ["-preset", intermediate_preset(), "-crf", INTERMEDIATE_CRF]
+    return ["-preset", FINAL_PRESET, "-crf", FINAL_CRF]
+
+
+@lru_cache(maxsize=None)
+def intermediate_preset():
+    """Preset do libx264 para intermediários; resolvido uma vez por processo"""
+    if INTERMEDIATE_PRESET != "auto":
+        return INTERMEDIATE_PRESET
+    # a velocidade medida depende das threads do encoder: outro orçamento mede de novo
+    version = (
+        f"{ffmpeg_version()} crf {INTERMEDIATE_CRF} fps {AUTOTUNE_MIN_FPS} ssim {AUTOTUNE_MIN_SSIM}"
+        f" threads {encoder_thread_args()[1]}"
+    )
+    return cached_probe("x264_intermediate_preset", version, autotune_preset) or AUTOTUNE_FALLBACK
+
+
+def measure_preset(preset, work_dir):
+    """(quadros por segundo, SSIM) do libx264 com `preset` na amostra"""
+    encoded = os.path.join(work_dir, f"{preset}.mp4")
+    frames = AUTOTUNE_SECONDS * 30
+    started = time.perf_counter()
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        *ffmpeg_thread_args(),
+        "-f", "lavfi", "-i", AUTOTUNE_SOURCE,
+        "-frames:v", str(frames),
+        "-c:v", "libx264", "-preset", preset, "-crf", INTERMEDIATE_CRF,
+        *encoder_thread_args(),
+        encoded
+    ], check=True, capture_output=True, timeout=300)
+    fps = frames / (time.perf_counter() - started)
+
+    proc = subprocess.run([
+        "ffmpeg", "-v", "info",
+        "-i", encoded,
+        "-f", "lavfi", "-i", AUTOTUNE_SOURCE,
+        "-lavfi", "[0:v][1:v]ssim",
+        "-frames:v", str(frames),
+        "-f", "null", "-"
+    ], check=True, capture_output=True, text=True, timeout=300)
+    match = _SSIM_RE.search(proc.stderr)
+    return fps, float(match.group(1)) if match else 0.0
+
+
+def autotune_preset():
+    """Preset mais lento que ainda atinge AUTOTUNE_MIN_FPS e AUTOTUNE_MIN_SSIM.
+
+    Se nenhum atingir a velocidade, fica o mais rápido com SSIM suficiente.
+    Se o ffmpeg falhar, retorna None (não vai para o cache e fica
+    AUTOTUNE_FALLBACK nesta execução).
+    """
+    print(f"⏱  Medindo presets do libx264 para intermediários (alvo ≥ {AUTOTUNE_MIN_FPS:.0f} fps, SSIM ≥ {AUTOTUNE_MIN_SSIM})")
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="autotune_") as work_dir:
+        for preset in AUTOTUNE_PRESETS:
+            try:
+                fps, ssim = measure_preset(preset, work_dir)
+            except (OSError, subprocess.SubprocessError) as e:
+                print(f"⚠️  Autotune interrompido ({type(e).__name__}) — usando {AUTOTUNE_FALLBACK}")
+                return None
+            results[preset] = (fps, ssim)
+            print(f"   {preset:>9}: {fps:6.1f} fps | SSIM {ssim:.4f}")
+            # presets seguintes são mais lentos: não adianta continuar
+            if fps < AUTOTUNE_MIN_FPS:
+                break
+
+    good = [p for p, (_, ssim) in results.items() if ssim >= AUTOTUNE_MIN_SSIM]
+    fast = [p for p in good if results[p][0] >= AUTOTUNE_MIN_FPS]
+    chosen = fast[-1] if fast else (good[0] if good else AUTOTUNE_FALLBACK)
+
+    print(f"✔ Preset intermediário: {chosen}")
+    emit("encoder_autotune", chosen=chosen, results={p: [round(f, 1), round(s, 4)] for p, (f, s) in results.items()})
+    return chosen
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# colunas por quadro salvas em disco (.npz, um array por coluna)
+FEATURE_STORE_FOLDER = os.getenv("FEATURE_STORE_FOLDER", os.path.join("normalized", "features"))
+
+FINGERPRINT_CHUNK = 4 * 1024 * 1024
+
+
+def video_fingerprint(video_path, chunk_size=FINGERPRINT_CHUNK):
+    """Hash do conteúdo do vídeo (tamanho + blocos do início, meio e fim).
+
+    Ler o arquivo inteiro custaria quase tanto quanto decodificá-lo; os três
+    blocos já mudam sempre que o conteúdo do merge muda.
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha1(str(size).encode())
+
+    with open(video_path, "rb") as f:
+        for offset in (0, max(0, size // 2 - chunk_size // 2), max(0, size - chunk_size)):
+            f.seek(offset)
+            digest.update(f.read(chunk_size))
+
+    return digest.hexdigest()
+
+
+def store_path(video_path, params, folder=FEATURE_STORE_FOLDER):
+    """Caminho do store para (conteúdo do vídeo, parâmetros da análise)"""
+    params_hash = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return os.path.join(folder, f"{video_fingerprint(video_path)[:16]}_{params_hash[:12]}.npz")
+
+
+def save_features(path, fps, frame_count, columns, params):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        __fps__=np.float64(fps),
+        __frame_count__=np.int64(frame_count),
+        __params__=np.array(json.dumps(params, sort_keys=True)),
+        **columns
+    )
+    os.replace(tmp_path, path)
+    print(f"💾 Features por quadro salvas em {path}")
+
+
+def load_features(path):
+    """Retorna (fps, frame_count, columns) ou None se o store não existir"""
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with np.load(path) as data:
+            fps = float(data["__fps__"])
+            frame_count = int(data["__frame_count__"])
+            columns = {k: data[k] for k in data.files if not k.startswith("__")}
+    except Exception as e:
+        print(f"⚠️  Store de features ilegível ({path}): {e} — recalculando")
+        return None
+
+    return fps, frame_count, columns
@@ -1,7 +1,22 @@
+import json
 import subprocess
 import os
+import shutil
+import tempfile
+import threading
+import time
 import uuid
+from collections import deque
+from functools import lru_cache
+from core import clip_cache
+from core.capabilities import cached_probe, ffmpeg_version
 from core.camera_motion_analysis import analyze_camera_motion
+from core.encoder_profiles import encoding_args
+from core.feature_store import video_fingerprint
+from core.media_probe import probe_has_audio
+from core.resources import decoder_thread_args, encoder_thread_args, ffmpeg_thread_args, filter_thread_args
+from core.telemetry import emit
+from core.timeline import VirtualTimeline
 
 # Detectar se h264_nvenc realmente está disponível (fallback automático)
 def detect_available_encoder():
@@ -36,34 +51,138 @@ def detect_available_encoder():
         return "libx264", False
 
 USE_GPU = os.getenv("USE_GPU", "0") == "1"
-FFMPEG_CODEC, NVENC_AVAILABLE = detect_available_encoder() if USE_GPU else ("libx264", False)
-FFMPEG_HWACCEL_ARGS = ["-hwaccel", "cuda"] if NVENC_AVAILABLE else []
+
+
+@lru_cache(maxsize=None)
+def encoder_config():
+    """(codec, nvenc_disponível); o teste roda no primeiro encode, não no import.
+
+    O resultado fica em disco por host + versão do ffmpeg, então workers e
+    execuções seguintes não repetem o encode de teste.
+    """
+    if not USE_GPU:
+        return "libx264", False
+    codec, available = cached_probe(
+        "h264_nvenc", ffmpeg_version(), lambda: list(detect_available_encoder()),
+        positive=lambda result: result[1]
+    )
+    return codec, available
+
+
+def ffmpeg_codec():
+    return encoder_config()[0]
+
+
+def hwaccel_args():
+    return ["-hwaccel", "cuda"] if encoder_config()[1] else []
+
+
+# telemetria do ffmpeg: intervalo das linhas de progresso e alerta de travamento
+FFMPEG_PROGRESS_INTERVAL = float(os.getenv("FFMPEG_PROGRESS_INTERVAL", "10"))
+FFMPEG_STALL_TIMEOUT = float(os.getenv("FFMPEG_STALL_TIMEOUT", "120"))
+FFMPEG_STDERR_TAIL = 200
+
+
+def with_progress_args(command):
+    """Pede ao ffmpeg o relatório `-progress` em stdout (chave=valor)"""
+    if "-progress" in command:
+        return command
+    return [command[0], "-progress", "pipe:1", "-nostats", *command[1:]]
+
+
+def run_ffmpeg_streaming(command, description):
+    """Roda o ffmpeg lendo o `-progress` ao vivo.
+
+    Emite eventos `ffmpeg_progress` (fps, speed, tempo de saída) no trace,
+    alerta `ffmpeg_stalled` se nada avançar por FFMPEG_STALL_TIMEOUT e guarda
+    só as últimas linhas do stderr em memória.
+    """
+    proc = subprocess.Popen(
+        with_progress_args(command),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    stderr_tail = deque(maxlen=FFMPEG_STDERR_TAIL)
+    last_update = [time.monotonic()]
+    done = threading.Event()
+
+    def drain_stderr():
+        for line in proc.stderr:
+            stderr_tail.append(line)
+
+    def watch_stall():
+        alerted = False
+        while not done.wait(5):
+            idle = time.monotonic() - last_update[0]
+            if idle > FFMPEG_STALL_TIMEOUT and not alerted:
+                print(f"⚠️  ffmpeg sem progresso há {idle:.0f}s ({description})")
+                emit("ffmpeg_stalled", description=description, idle_s=round(idle, 1))
+                alerted = True
+            elif idle <= FFMPEG_STALL_TIMEOUT:
+                alerted = False
+
+    threads = [threading.Thread(target=drain_stderr, daemon=True),
+               threading.Thread(target=watch_stall, daemon=True)]
+    for t in threads:
+        t.start()
+
+    started = time.monotonic()
+    last_print = 0.0
+    progress = {}
+    for line in proc.stdout:
+        key, _, value = line.strip().partition("=")
+        progress[key] = value
+        if key != "progress":
+            continue
+
+        now = time.monotonic()
+        last_update[0] = now
+        event = {
+            "description": description,
+            "frame": int(progress.get("frame", 0) or 0),
+            "fps": float(progress.get("fps", 0) or 0),
+            "speed": progress.get("speed", "").rstrip("x").strip(),
+            "out_time": progress.get("out_time", ""),
+            "elapsed_s": round(now - started, 1),
+        }
+        emit("ffmpeg_progress", **event)
+        if value == "end" or now - last_print >= FFMPEG_PROGRESS_INTERVAL:
+            print(f"   ⏳ {description}: frame={event['frame']} fps={event['fps']:.1f} "
+                  f"speed={event['speed']}x t={event['out_time']}")
+            last_print = now
+
+    returncode = proc.wait()
+    done.set()
+    threads[0].join()
+
+    stderr = "".join(stderr_tail)
+    emit("ffmpeg_end", description=description, returncode=returncode,
+         wall_s=round(time.monotonic() - started, 3))
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, output="", stderr=stderr)
+    return subprocess.CompletedProcess(command, returncode, stdout="", stderr=stderr)
 
 
 def run_ffmpeg(command, description="ffmpeg", retry_hwaccel=True):
     try:
         print(f"   running: {' '.join(command)}")
-        proc = subprocess.run(command, check=True, capture_output=True, text=True)
-        if proc.stdout:
-            print(proc.stdout)
-        return proc
+        return run_ffmpeg_streaming(command, description)
     except subprocess.CalledProcessError as e:
         print(f"Error while {description}: returncode={e.returncode}")
         if e.stdout:
             print("--- ffmpeg stdout ---")
             print(e.stdout)
         if e.stderr:
-            print("--- ffmpeg stderr ---")
+            print("--- ffmpeg stderr (últimas linhas) ---")
             print(e.stderr)
         # attempt fallback to CPU decoding/encoding on first failure
         if retry_hwaccel:
             stderr_lower = e.stderr.lower() if e.stderr else ""
-            if FFMPEG_HWACCEL_ARGS and any(x in stderr_lower for x in ["cuda_error_no_device","cu->cuinit","no cuda-capable device"]):
+            if hwaccel_args() and any(x in stderr_lower for x in ["cuda_error_no_device","cu->cuinit","no cuda-capable device"]):
                 print("⚠️  CUDA device unavailable during ffmpeg run; retrying without hwaccel and nvenc")
             else:
                 print("⚠️  ffmpeg command failed; retrying once in CPU-only mode")
             # remove hwaccel arguments
-            new_command = [arg for arg in command if arg not in FFMPEG_HWACCEL_ARGS]
+            new_command = [arg for arg in command if arg not in hwaccel_args()]
             # replace nvenc codec with libx264 if present
             for i, arg in enumerate(new_command):
                 if arg == "-c:v" and i+1 < len(new_command) and new_command[i+1] == "h264_nvenc":
@@ -72,64 +191,576 @@ def run_ffmpeg(command, description="ffmpeg", retry_hwaccel=True):
         raise
 
 
-def get_encoding_args(codec):
-    """Retorna argumentos de encoding corretos conforme o codec"""
-    if codec == "h264_nvenc":
-        # NVENC não suporta -crf, usa -rc vbr (variable bitrate) com -qp (quality)
-        return ["-rc", "vbr", "-cq", "18", "-preset", "slow"]
-    else:
-        # libx264 usa -crf (constant rate factor)
-        return ["-preset", "slow", "-crf", "18"]
+# "filtergraph": um único encode (cortes, aceleração, concat e LUT num só
+# filter_complex); "clips": fluxo antigo com clipes temporários + concat + LUT;
+# "cached": um clipe final por cena em cache (core/clip_cache.py) + concat sem
+# reencode, então re-renders só codificam as cenas novas ou alteradas
+RENDER_MODE = os.getenv("RENDER_MODE", "filtergraph")
 
+LUT_PATH = "assets/luts/cinematic.cube"
 
+# proporções geradas no mesmo render do highlight (16:9 sempre sai); os
+# recortes seguem o centro das pessoas detectadas na análise
+EXPORT_FORMATS = [f.strip() for f in os.getenv("EXPORT_FORMATS", "16:9,9:16").split(",") if f.strip()]
+FORMAT_SIZES = {"9:16": (1080, 1920), "1:1": (1080, 1080)}
+FORMAT_TAGS = {"9:16": "tiktok_9x16", "1:1": "square_1x1"}
 
-def build_highlight(video_path, selected_scenes, output_path):
-    import tempfile
-    temp_files = []
 
-    print("🎬 Iniciando geração de highlight...")
+def lut_is_valid(path):
+    """Check .cube validity by comparing entry count against LUT_3D_SIZE"""
+    try:
+        with open(path) as f:
+            lines = [l.strip() for l in f if l.strip() and not l.strip().startswith('#')]
+        size_line = next((l for l in lines if l.startswith('LUT_3D_SIZE')), None)
+        if not size_line:
+            return False
+        parts = size_line.split()
+        if len(parts) < 2:
+            return False
+        n = int(parts[1])
+        # data lines are those starting with a digit (r g b)
+        data = [l for l in lines if l[0].isdigit()]
+        return len(data) == n**3
+    except Exception:
+        return False
+
+
+def resolve_lut(lut_path=LUT_PATH):
+    """Caminho absoluto da LUT ou None se ela não passar na validação"""
+    # Resolver caminho absoluto para LUT (funciona dentro e fora de containers)
+    if not os.path.isabs(lut_path):
+        lut_path = os.path.abspath(lut_path)
 
+    if not os.path.exists(lut_path):
+        raise FileNotFoundError(
+            f"LUT file not found: {lut_path}\nCwd: {os.getcwd()}"
+        )
+    # quick sanity: ensure LUT file isn't obviously too small
+    size = os.path.getsize(lut_path)
+    if size < 1024:  # arbitrary threshold; correct LUTs are several KB
+        print(f"⚠️  LUT file {lut_path} seems too small ({size} bytes), it may be corrupted")
+
+    if not lut_is_valid(lut_path):
+        print(f"⚠️  LUT file {lut_path} failed validation, skipping color grading")
+        return None
+
+    return lut_path
+
+
+def quote_filter_path(path):
+    """Caminho entre aspas simples para uso como opção dentro de um filtergraph"""
+    return "'" + path.replace("\\", "/").replace("'", r"'\''") + "'"
+
+
+def plan_highlight(timeline, selected_scenes, camera_motion=None, subject_tracks=None, verbose=True):
+    """Decide para cada cena: descartar (tremedeira), acelerar 2x ou manter.
+
+    Retorna uma lista de dicts (start, end, source, local_start, duration,
+    speed e, se houver, subject_x: trilha do centro das pessoas, 0-1).
+    `verbose=False` não imprime as decisões (render especulativo).
+    """
+    log = print if verbose else (lambda *args: None)
+    clips = []
     for start, end in selected_scenes:
         duration = end - start
-        temp_name = os.path.join(tempfile.gettempdir(), f"clip_{uuid.uuid4().hex}.mp4")
+        source_path, local_start = timeline.locate(start)
 
-        cam_motion, cam_instability = analyze_camera_motion(video_path, start, end)
+        if camera_motion and (start, end) in camera_motion:
+            cam_motion, cam_instability = camera_motion[(start, end)]
+        else:
+            cam_motion, cam_instability = analyze_camera_motion(
+                source_path, local_start, local_start + duration
+            )
 
-        print(
+        log(
             f"Cena {start:.2f}s → {end:.2f}s | "
             f"Motion={cam_motion:.2f} | Instab={cam_instability:.2f}"
         )
 
         # ❌ Descartar tremedeira forte
         if cam_instability > 3:
-            print("❌ Tremedeira forte detectada — descartando cena")
+            log("❌ Tremedeira forte detectada — descartando cena")
             continue
 
-        ffmpeg_command = [
+        speed = 1.0
+        # 🚀 Acelerar se câmera parada
+        if cam_motion < 0.8 and cam_instability < 1:
+            log("⚡ Cena estática — acelerando 2x")
+            speed = 2.0
+
+        clip = {
+            "start": start,
+            "end": end,
+            "source": source_path,
+            "local_start": local_start,
+            "duration": duration,
+            "speed": speed,
+        }
+        if subject_tracks and (start, end) in subject_tracks:
+            clip["subject_x"] = subject_tracks[(start, end)]
+        clips.append(clip)
+
+    return clips
+
+
+def build_highlight(video_path, selected_scenes, output_path, camera_motion=None, draft=False,
+                    subject_tracks=None):
+    """Gera o highlight a partir das cenas selecionadas.
+
+    `video_path` pode ser um arquivo ou uma VirtualTimeline; nesse caso os
+    tempos são globais e cada cena é cortada direto do arquivo de origem.
+    `camera_motion` opcional: dict {(start, end): (cam_motion, cam_instability)}
+    já calculado na análise, evitando decodificar cada cena de novo.
+    `subject_tracks` opcional: dict {(start, end): [centro x 0-1, ...]} que
+    guia o recorte das versões vertical/quadrada.
+    `draft=True` gera uma prévia rápida (stream copy, sem LUT).
+
+    A seleção final fica salva em `<saida>.edl.json`; `render_from_edl`
+    gera o render final depois, sem refazer a análise.
+    """
+    print("🎬 Iniciando geração de highlight...")
+
+    if isinstance(video_path, VirtualTimeline):
+        timeline = video_path
+    else:
+        timeline = VirtualTimeline([video_path], durations=[float("inf")])
+
+    clips = plan_highlight(timeline, selected_scenes, camera_motion, subject_tracks)
+
+    if not clips:
+        print("⚠ Nenhuma cena válida encontrada.")
+        return
+
+    write_edl(clips, edl_path_for(output_path))
+    render_clips(clips, output_path, draft=draft)
+
+
+def export_formats(formats=None):
+    """16:9 primeiro, seguido das proporções extras conhecidas"""
+    extra = [f for f in (formats or EXPORT_FORMATS) if f in FORMAT_SIZES]
+    return ["16:9"] + list(dict.fromkeys(extra))
+
+
+def format_output_path(output_path, fmt):
+    """highlight_horizontal.mp4 → highlight_tiktok_9x16.mp4 / highlight_square_1x1.mp4"""
+    if fmt == "16:9":
+        return output_path
+    folder, name = os.path.split(output_path)
+    base, ext = os.path.splitext(name)
+    return os.path.join(folder, f"{base.replace('_horizontal', '')}_{FORMAT_TAGS[fmt]}{ext}")
+
+
+def render_clips(clips, output_path, draft=False):
+    formats = ["16:9"]
+    if draft:
+        render_draft(clips, output_path)
+    elif RENDER_MODE == "cached":
+        formats = export_formats()
+        render_cached(clips, output_path, formats)
+    elif RENDER_MODE == "clips":
+        if len(export_formats()) > 1:
+            print("ℹ️  RENDER_MODE=clips gera só a versão 16:9")
+        render_with_intermediates(clips, output_path)
+    else:
+        formats = export_formats()
+        render_filtergraph(clips, output_path, formats)
+
+    for fmt in formats:
+        path = format_output_path(output_path, fmt)
+        # Validar arquivo não ficou vazio
+        if os.path.getsize(path) == 0:
+            raise RuntimeError(f"Output file is empty: {path}")
+
+        file_size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"✅ Highlight {fmt} finalizado com sucesso! ({path}, {file_size_mb:.1f} MB)")
+
+
+# =====================================================
+# EDL (lista de decisões de edição) E PRÉVIA RÁPIDA
+# =====================================================
+
+def edl_path_for(output_path):
+    return f"{os.path.splitext(output_path)[0]}.edl.json"
+
+
+def write_edl(clips, edl_path):
+    with open(edl_path, "w") as f:
+        json.dump({"version": 1, "clips": clips}, f, indent=2)
+    print(f"📝 EDL salva em {edl_path}")
+
+
+def load_edl(edl_path):
+    with open(edl_path) as f:
+        return json.load(f)["clips"]
+
+
+def render_from_edl(edl_path, output_path, draft=False):
+    """Renderiza exatamente os cortes de uma EDL salva (ex.: depois da prévia)"""
+    clips = load_edl(edl_path)
+    print(f"🎬 Renderizando {len(clips)} cenas a partir de {edl_path}")
+    render_clips(clips, output_path, draft=draft)
+
+
+def render_draft(clips, output_path):
+    """Prévia sem reencode: concat demuxer com inpoint/outpoint e stream copy.
+
+    Os cortes caem no keyframe anterior ao início da cena, a aceleração 2x e
+    a LUT são ignoradas — serve só para revisar quais cenas entraram.
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", prefix="draft_", delete=False) as f:
+        list_file = f.name
+        for clip in clips:
+            f.write(f"file '{os.path.abspath(clip['source'])}'\n")
+            f.write(f"inpoint {clip['local_start']:.3f}\n")
+            f.write(f"outpoint {clip['local_start'] + clip['duration']:.3f}\n")
+
+    print(f"⚡ Prévia rápida: {len(clips)} cenas em stream copy (sem LUT)")
+    command = [
+        "ffmpeg",
+        "-y",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", list_file,
+        "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        output_path
+    ]
+    try:
+        run_ffmpeg(command, description="rendering draft highlight", retry_hwaccel=False)
+    finally:
+        os.remove(list_file)
+
+
+def subject_crop_x(clips):
+    """Expressão `x` do crop que segue o centro das pessoas no highlight.
+
+    Cada cena contribui com os pontos da sua trilha (no tempo de saída, já
+    com a aceleração); entre pontos a posição é interpolada linearmente e no
+    corte entre cenas ela salta. O resultado é uma soma de trechos
+    gte(t)*lt(t)*reta, avaliada por quadro pelo filtro crop.
+    """
+    points = []
+    offset = 0.0
+    for clip in clips:
+        track = clip.get("subject_x") or [0.5]
+        out_duration = clip["duration"] / clip["speed"]
+        points.append((offset, track[0]))
+        for k, value in enumerate(track):
+            points.append((offset + (k + 0.5) * out_duration / len(track), value))
+        points.append((offset + out_duration, track[-1]))
+        offset += out_duration
+
+    terms = []
+    for (t0, v0), (t1, v1) in zip(points, points[1:]):
+        if t1 - t0 < 1e-3:
+            continue
+        slope = (v1 - v0) / (t1 - t0)
+        terms.append(f"gte(t,{t0:.3f})*lt(t,{t1:.3f})*({v0:.3f}+{slope:.5f}*(t-{t0:.3f}))")
+    terms.append(f"gte(t,{points[-1][0]:.3f})*{points[-1][1]:.3f}")
+
+    return f"clip(({'+'.join(terms)})*iw-ow/2,0,iw-ow)"
+
+
+def format_filter(fmt, crop_x="(iw-ow)/2"):
+    """Cadeia que converte o quadro 16:9 na proporção `fmt`"""
+    if fmt not in FORMAT_SIZES:
+        return "null"
+    width, height = FORMAT_SIZES[fmt]
+    crop_w = f"trunc(ih*{width}/{height}/2)*2"
+    return f"crop=w={crop_w}:h=ih:x='{crop_x}':y=0,scale={width}:{height},setsar=1"
+
+
+def highlight_filtergraph(clips, with_audio, lut_path=None, formats=("16:9",)):
+    """filter_complex com uma entrada por cena: setpts/atempo, concat e lut3d.
+
+    Com mais de um formato o vídeo tratado passa por `split` (e o áudio por
+    `asplit`); as saídas são [vout0], [vout1], ... e [aout0], [aout1], ...
+    na ordem de `formats`.
+    """
+    parts = []
+    labels = []
+    for i, clip in enumerate(clips):
+        video = f"[{i}:v]setpts=PTS-STARTPTS"
+        audio = f"[{i}:a]asetpts=PTS-STARTPTS"
+        if clip["speed"] != 1.0:
+            video += f",setpts=PTS/{clip['speed']}"
+            audio += f",atempo={clip['speed']}"
+        parts.append(f"{video}[v{i}]")
+        labels.append(f"[v{i}]")
+        if with_audio:
+            parts.append(f"{audio}[a{i}]")
+            labels.append(f"[a{i}]")
+
+    concat_out = "[vcat][acat]" if with_audio else "[vcat]"
+    parts.append(f"{''.join(labels)}concat=n={len(clips)}:v=1:a={int(with_audio)}{concat_out}")
+
+    grade = f"lut3d=file={quote_filter_path(lut_path)}" if lut_path else "null"
+    count = len(formats)
+    if count == 1:
+        parts.append(f"[vcat]{grade}[vout0]")
+        if with_audio:
+            parts.append("[acat]anull[aout0]")
+        return ";".join(parts)
+
+    parts.append(f"[vcat]{grade},split={count}" + "".join(f"[vsplit{k}]" for k in range(count)))
+    if with_audio:
+        parts.append(f"[acat]asplit={count}" + "".join(f"[aout{k}]" for k in range(count)))
+
+    crop_x = subject_crop_x(clips)
+    for k, fmt in enumerate(formats):
+        parts.append(f"[vsplit{k}]{format_filter(fmt, crop_x)}[vout{k}]")
+
+    return ";".join(parts)
+
+
+def render_filtergraph(clips, output_path, formats=("16:9",)):
+    """Renderiza o highlight com um único encode.
+
+    Cada cena entra como uma entrada própria com -ss/-t (seek rápido, sem
+    decodificar o arquivo desde o início); o áudio só é mantido se todas
+    as origens tiverem áudio, para o concat ficar consistente. Cada formato
+    extra é uma saída a mais do mesmo ffmpeg: decode, cortes e LUT uma vez só.
+    """
+    with_audio = all(probe_has_audio(clip["source"]) for clip in clips)
+
+    inputs = []
+    for clip in clips:
+        inputs += [
+            *decoder_thread_args(),
+            *hwaccel_args(),
+            "-ss", str(clip["local_start"]),
+            "-t", str(clip["duration"]),
+            "-i", clip["source"],
+        ]
+
+    outputs = []
+    for k, fmt in enumerate(formats):
+        outputs += [
+            "-map", f"[vout{k}]",
+            *(["-map", f"[aout{k}]"] if with_audio else ["-an"]),
+            "-c:v", ffmpeg_codec(),
+            *encoding_args(ffmpeg_codec()),
+            *encoder_thread_args(len(formats)),
+            format_output_path(output_path, fmt),
+        ]
+
+    def command_for(lut_path):
+        return [
             "ffmpeg",
             "-y",
-            "-threads", "0",
-            *FFMPEG_HWACCEL_ARGS,
-            "-ss", str(start),
-            "-i", video_path,
-            "-t", str(duration),
+            *filter_thread_args(),
+            *inputs,
+            "-filter_complex", highlight_filtergraph(clips, with_audio, lut_path, formats),
+            *outputs
         ]
 
-        # 🚀 Acelerar se câmera parada
-        if cam_motion < 0.8 and cam_instability < 1:
-            print("⚡ Cena estática — acelerando 2x")
+    lut_path = resolve_lut()
+    if lut_path is None:
+        print("🎨 Pulando aplicação de LUT (arquivo inválido)")
+        run_ffmpeg(command_for(None), description="rendering highlight without LUT")
+        return
+
+    print(f"🎨 Renderizando {len(clips)} cenas + LUT em um único encode ({', '.join(formats)})")
+    try:
+        run_ffmpeg(command_for(lut_path), description="rendering highlight with LUT")
+    except subprocess.CalledProcessError:
+        # if LUT fails (e.g. unexpected EOF) fall back to rendering without it
+        print("⚠️  failed to apply LUT, proceeding without color grade")
+        run_ffmpeg(command_for(None), description="rendering highlight without LUT")
+
+
+def clip_filtergraph(clip, with_audio, lut_path, fmt):
+    """filter_complex de uma cena isolada: aceleração, LUT e recorte do formato"""
+    video = "[0:v]setpts=PTS-STARTPTS"
+    audio = "[0:a]asetpts=PTS-STARTPTS"
+    if clip["speed"] != 1.0:
+        video += f",setpts=PTS/{clip['speed']}"
+        audio += f",atempo={clip['speed']}"
+    if lut_path:
+        video += f",lut3d=file={quote_filter_path(lut_path)}"
+    if fmt != "16:9":
+        video += "," + format_filter(fmt, subject_crop_x([clip]))
+
+    parts = [f"{video}[vout]"]
+    if with_audio:
+        parts.append(f"{audio}[aout]")
+    return ";".join(parts)
+
+
+def encode_cached_clip(clip, with_audio, lut_path, fmt, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # nome temporário único: dois renders gerando o mesmo clipe não se atrapalham
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp.mp4"
+    command = [
+        "ffmpeg",
+        "-y",
+        *ffmpeg_thread_args(),
+        *hwaccel_args(),
+        "-ss", str(clip["local_start"]),
+        "-t", str(clip["duration"]),
+        "-i", clip["source"],
+        "-filter_complex", clip_filtergraph(clip, with_audio, lut_path, fmt),
+        "-map", "[vout]",
+        *(["-map", "[aout]"] if with_audio else ["-an"]),
+        "-c:v", ffmpeg_codec(),
+        *encoding_args(ffmpeg_codec()),
+        *encoder_thread_args(),
+        tmp_path
+    ]
+    try:
+        run_ffmpeg(command, description=f"caching scene {clip['start']:.2f}-{clip['end']:.2f} ({fmt})")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def concat_clips(paths, output_path, with_audio=True):
+    """Junta clipes já codificados com o concat demuxer, sem reencode.
+
+    `with_audio=False` descarta o áudio (clipes com e sem áudio misturados).
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", prefix="concat_", delete=False) as f:
+        list_file = f.name
+        for path in paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+
+    command = [
+        "ffmpeg",
+        "-y",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", list_file,
+        "-c", "copy",
+        *([] if with_audio else ["-an"]),
+        output_path
+    ]
+    try:
+        run_ffmpeg(command, description=f"concatenating cached clips into {output_path}", retry_hwaccel=False)
+    finally:
+        os.remove(list_file)
+
+
+def render_cached(clips, output_path, formats=("16:9",)):
+    """Render com cache de clipes endereçado por conteúdo.
+
+    Cada (cena, formato) vira um clipe final identificado por hash da origem,
+    corte, aceleração, encoder, LUT e recorte; clipes já existentes são
+    reaproveitados e o highlight sai de um concat em stream copy. Cada clipe
+    guarda o áudio da própria origem (a chave não depende da seleção, então
+    o render especulativo acerta o cache); o áudio só fica no highlight se
+    todas as origens tiverem, senão o concat o descarta.
+    """
+    lut_path = resolve_lut()
+    if lut_path is None:
+        print("🎨 Pulando aplicação de LUT (arquivo inválido)")
+        _render_cached(clips, output_path, formats, None)
+        return
+
+    try:
+        _render_cached(clips, output_path, formats, lut_path)
+    except subprocess.CalledProcessError:
+        # if LUT fails (e.g. unexpected EOF) fall back to rendering without it
+        print("⚠️  failed to apply LUT, proceeding without color grade")
+        _render_cached(clips, output_path, formats, None)
+
+
+def cached_clip(clip, fmt, with_audio, lut_path, hashes):
+    """Caminho do clipe no cache, codificando se ainda não existir.
+
+    `with_audio` é se a origem do clipe tem áudio (não a seleção inteira).
+    `hashes` guarda os hashes de origens e LUT já calculados ({caminho: hash}).
+    Retorna (caminho, reaproveitado).
+    """
+    if clip["source"] not in hashes:
+        hashes[clip["source"]] = video_fingerprint(clip["source"])
+    if lut_path and lut_path not in hashes:
+        hashes[lut_path] = clip_cache.file_hash(lut_path)
+
+    encoder = [ffmpeg_codec(), *encoding_args(ffmpeg_codec())]
+    lut_hash = hashes[lut_path] if lut_path else None
+    key = clip_cache.clip_key(hashes[clip["source"]], clip, encoder, lut_hash, fmt, with_audio)
+    path = clip_cache.cached_clip_path(key)
+
+    if clip_cache.lookup(path):
+        return path, True
+    encode_cached_clip(clip, with_audio, lut_path, fmt, path)
+    return path, False
+
+
+def precache_clip(clip, formats, lut_path, hashes):
+    """Codifica antecipadamente um clipe em todos os formatos; retorna quantos foram codificados.
+
+    Mesma chave do `render_cached`: o áudio é o da própria origem.
+    """
+    with_audio = probe_has_audio(clip["source"])
+    return sum(
+        not cached_clip(clip, fmt, with_audio, lut_path, hashes)[1]
+        for fmt in formats
+    )
+
+
+def _render_cached(clips, output_path, formats, lut_path):
+    hashes = {}
+    used = []
+    reused = 0
+    audio = {source: probe_has_audio(source) for source in {clip["source"] for clip in clips}}
+
+    for fmt in formats:
+        paths = []
+        for clip in clips:
+            path, hit = cached_clip(clip, fmt, audio[clip["source"]], lut_path, hashes)
+            reused += hit
+            paths.append(path)
+
+        concat_clips(paths, format_output_path(output_path, fmt), all(audio.values()))
+        used += paths
+
+    print(f"♻️  Cache de clipes: {reused} de {len(used)} reaproveitados, {len(used) - reused} codificados")
+    emit("clip_cache", reused=reused, encoded=len(used) - reused)
+    clip_cache.evict(keep=used)
+
+
+def render_with_intermediates(clips, output_path):
+    # pasta temporária própria: renders simultâneos não disputam os mesmos nomes
+    work_dir = tempfile.mkdtemp(prefix="highlight_")
+    try:
+        _render_with_intermediates(clips, output_path, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _render_with_intermediates(clips, output_path, work_dir):
+    temp_files = []
 
+    for clip in clips:
+        start, end = clip["start"], clip["end"]
+        temp_name = os.path.join(work_dir, f"clip_{uuid.uuid4().hex}.mp4")
+
+        ffmpeg_command = [
+            "ffmpeg",
+            "-y",
+            *ffmpeg_thread_args(),
+            *hwaccel_args(),
+            "-ss", str(clip["local_start"]),
+            "-i", clip["source"],
+            "-t", str(clip["duration"]),
+        ]
+
+        if clip["speed"] != 1.0:
             ffmpeg_command += [
-                "-filter:v", "setpts=0.5*PTS",
+                "-filter:v", f"setpts=PTS/{clip['speed']}",
                 "-an",
-                "-c:v", FFMPEG_CODEC,
-                *get_encoding_args(FFMPEG_CODEC),
+                "-c:v", ffmpeg_codec(),
+                *encoding_args(ffmpeg_codec(), "intermediate"),
+                *encoder_thread_args(),
                 temp_name
             ]
         else:
             ffmpeg_command += [
-                "-c:v", FFMPEG_CODEC,
-                *get_encoding_args(FFMPEG_CODEC),
+                "-c:v", ffmpeg_codec(),
+                *encoding_args(ffmpeg_codec(), "intermediate"),
+                *encoder_thread_args(),
                 temp_name
             ]
 
@@ -137,84 +768,44 @@ def build_highlight(video_path, selected_scenes, output_path):
         run_ffmpeg(ffmpeg_command, description=f"extracting scene {start:.2f}-{end:.2f}")
         temp_files.append(temp_name)
 
-    if not temp_files:
-        print("⚠ Nenhuma cena válida encontrada.")
-        return
-
     # 2️⃣ Criar lista concat
-    list_file = os.path.join(tempfile.gettempdir(), "concat_list.txt")
+    list_file = os.path.join(work_dir, "concat_list.txt")
     with open(list_file, "w") as f:
         for file in temp_files:
             f.write(f"file '{file}'\n")
 
-    merged_temp = os.path.join(tempfile.gettempdir(), "merged_raw.mp4")
+    merged_temp = os.path.join(work_dir, "merged_raw.mp4")
 
     # 3️⃣ Concatenar
     print("🔗 Concatenando clipes intermediários")
     concat_command = [
         "ffmpeg",
         "-y",
-        "-threads", "0",
-        *FFMPEG_HWACCEL_ARGS,
+        *ffmpeg_thread_args(),
+        *hwaccel_args(),
         "-f", "concat",
         "-safe", "0",
         "-i", list_file,
-        "-c:v", FFMPEG_CODEC,
-        *get_encoding_args(FFMPEG_CODEC),
+        "-c:v", ffmpeg_codec(),
+        *encoding_args(ffmpeg_codec(), "intermediate"),
+        *encoder_thread_args(),
         merged_temp
     ]
 
     run_ffmpeg(concat_command, description="concatenating clips")
 
     # 4️⃣ Aplicar LUT cinematográfica
-    lut_path = "assets/luts/cinematic.cube"
-    
-    # Resolver caminho absoluto para LUT (funciona dentro e fora de containers)
-    if not os.path.isabs(lut_path):
-        lut_path = os.path.abspath(lut_path)
-    
-    if not os.path.exists(lut_path):
-        raise FileNotFoundError(
-            f"LUT file not found: {lut_path}\nCwd: {os.getcwd()}"
-        )
-    # quick sanity: ensure LUT file isn't obviously too small
-    size = os.path.getsize(lut_path)
-    if size < 1024:  # arbitrary threshold; correct LUTs are several KB
-        print(f"⚠️  LUT file {lut_path} seems too small ({size} bytes), it may be corrupted")
-
-    def lut_is_valid(path):
-        """Check .cube validity by comparing entry count against LUT_3D_SIZE"""
-        try:
-            with open(path) as f:
-                lines = [l.strip() for l in f if l.strip() and not l.strip().startswith('#')]
-            size_line = next((l for l in lines if l.startswith('LUT_3D_SIZE')), None)
-            if not size_line:
-                return False
-            parts = size_line.split()
-            if len(parts) < 2:
-                return False
-            n = int(parts[1])
-            # data lines are those starting with a digit (r g b)
-            data = [l for l in lines if l[0].isdigit()]
-            return len(data) == n**3
-        except Exception:
-            return False
-
-    if not lut_is_valid(lut_path):
-        print(f"⚠️  LUT file {lut_path} failed validation, skipping color grading")
-        # skip LUT entirely and just copy merged_temp to output later
-        bypass_lut = True
-    else:
-        bypass_lut = False
+    lut_path = resolve_lut()
 
-    if bypass_lut:
+    if lut_path is None:
         print("🎨 Pulando aplicação de LUT (arquivo inválido)")
         # just copy/encode merged_temp to output_path
         copy_cmd = [
-            "ffmpeg", "-y", "-threads", "0",
+            "ffmpeg", "-y", *ffmpeg_thread_args(),
             "-i", merged_temp,
-            "-c:v", FFMPEG_CODEC,
-            *get_encoding_args(FFMPEG_CODEC),
+            "-c:v", ffmpeg_codec(),
+            *encoding_args(ffmpeg_codec()),
+            *encoder_thread_args(),
             output_path
         ]
         run_ffmpeg(copy_cmd, description="finalizing without LUT")
@@ -223,12 +814,13 @@ def build_highlight(video_path, selected_scenes, output_path):
         color_command = [
             "ffmpeg",
             "-y",
-            "-threads", "0",
-            *FFMPEG_HWACCEL_ARGS,
+            *ffmpeg_thread_args(),
+            *hwaccel_args(),
             "-i", merged_temp,
             "-vf", f"lut3d={lut_path}",
-            "-c:v", FFMPEG_CODEC,
-            *get_encoding_args(FFMPEG_CODEC),
+            "-c:v", ffmpeg_codec(),
+            *encoding_args(ffmpeg_codec()),
+            *encoder_thread_args(),
             output_path
         ]
 
@@ -239,29 +831,15 @@ def build_highlight(video_path, selected_scenes, output_path):
             print("⚠️  failed to apply LUT, proceeding without color grade")
             # simply copy merged_temp to output_path using the codec
             fallback_cmd = [
-                "ffmpeg", "-y", "-threads", "0",
+                "ffmpeg", "-y", *ffmpeg_thread_args(),
                 "-i", merged_temp,
-                "-c:v", FFMPEG_CODEC,
-                *get_encoding_args(FFMPEG_CODEC),
+                "-c:v", ffmpeg_codec(),
+                *encoding_args(ffmpeg_codec()),
+                *encoder_thread_args(),
                 output_path
             ]
             run_ffmpeg(fallback_cmd, description="finalizing without LUT")
 
-    
-    # Validar arquivo não ficou vazio
-    if os.path.getsize(output_path) == 0:
-        raise RuntimeError(f"Output file is empty: {output_path}")
-    
-    file_size_mb = os.path.getsize(output_path) / (1024 * 1024)
-    print(f"✅ Highlight finalizado com sucesso! ({file_size_mb:.1f} MB)")
-
-    # Limpeza
-    for file in temp_files:
-        os.remove(file)
-
-    os.remove(list_file)
-    os.remove(merged_temp)
-
 
 # =====================================================
 # EXPORTAÇÃO VERTICAL (Instagram / Reels / TikTok)
@@ -272,12 +850,13 @@ def export_vertical(input_path, output_path):
     command = [
         "ffmpeg",
         "-y",
-        "-threads", "0",
-        *FFMPEG_HWACCEL_ARGS,
+        *ffmpeg_thread_args(),
+        *hwaccel_args(),
         "-i", input_path,
-        "-vf", "scale=1920:-1, crop=1080:1920:(in_w-1080)/2:0",
-        "-c:v", FFMPEG_CODEC,
-        *get_encoding_args(FFMPEG_CODEC),
+        "-vf", format_filter("9:16"),
+        "-c:v", ffmpeg_codec(),
+        *encoding_args(ffmpeg_codec()),
+        *encoder_thread_args(),
         output_path
     ]
 
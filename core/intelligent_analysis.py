@@ -1,120 +1,682 @@
+import json
+import os
+import sys
+import threading
+import time
+
 import cv2
 import numpy as np
-import torch
-from ultralytics import YOLO
-from core.camera_motion_analysis import analyze_camera_motion
+from core.camera_motion_analysis import (
+    CAMERA_MOTION_ESTIMATOR, SampledCameraMotion, analyze_camera_motion,
+    make_camera_motion_consumer, moving_average
+)
+from core.capabilities import cached_probe
+from core.decode_engine import ANALYSIS_WIDTH, FrameConsumer, StreamingDecoder
+from core.feature_store import load_features, save_features, store_path
+from core.motion_analysis import FrameDiffConsumer
+from core.person_detector import DETECTOR_BACKEND, detector_id, load_exported_detector
+from core.scene_detection import SCENE_DOWNSCALE, SCENE_THRESHOLD, SceneCutConsumer
+from core.telemetry import emit, stage
 
-# carregar YOLO uma única vez
-# Forçar CPU se houver erro CUDA para evitar "no kernel image" errors
+# YOLO é carregado uma vez por processo, no primeiro uso (ou no
+# inicializador de cada worker do pool de processos); torch e ultralytics só
+# são importados aí, então etapas sem detecção não pagam esse custo
+model = None
 device = "cpu"  # Default para CPU (mais estável em containers)
+PERSON_CLASS = 0
+# backend efetivamente carregado (volta para "torch" se o exportado falhar)
+detector_backend = DETECTOR_BACKEND
+# threads de torch/OpenCV/ONNX definidas por set_analysis_threads (0 = padrão das libs)
+analysis_threads = 0
+_detector_lock = threading.Lock()
+
+
+def set_analysis_threads(num_threads):
+    """Limita as threads de OpenCV e do detector neste processo"""
+    global analysis_threads
+
+    analysis_threads = num_threads
+    cv2.setNumThreads(num_threads)
+    # torch só é importado junto com o detector; se já foi, ajusta agora
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(num_threads)
+
+
+def load_detector(num_threads=0):
+    global model, detector_backend
+
+    num_threads = num_threads or analysis_threads
+    with _detector_lock:
+        if model is None and detector_backend != "torch":
+            model = load_exported_detector(imgsz=DETECT_IMGSZ, num_threads=num_threads)
+            if model is None:
+                detector_backend = "torch"
+        return _load_detector()
 
-# Tentar GPU apenas se disponível E se conseguir fazer inference
-if torch.cuda.is_available():
-    try:
-        model = YOLO("yolov8n.pt")
-        model.to("cuda")
-        # Teste rápido: tentar inference em GPU
-        test_frame = np.zeros((640, 640, 3), dtype=np.uint8)
-        _ = model(test_frame, verbose=False, device="cuda")
-        device = "cuda"
-        print("⛩  YOLO carregado na GPU")
-    except Exception as e:
-        print(f"⚠️  CUDA unavailable para YOLO: {type(e).__name__}")
-        print("   Continuando com YOLO na CPU")
-        device = "cpu"
 
-model = YOLO("yolov8n.pt")
-model.to(device)
+def _load_detector():
+    global model, device, PERSON_CLASS
+
+    if model is not None:
+        return model
+
+    import torch
+    from ultralytics import YOLO
+
+    if analysis_threads:
+        torch.set_num_threads(analysis_threads)
+    model = YOLO("yolov8n.pt")
+
+    # Forçar CPU se houver erro CUDA para evitar "no kernel image" errors
+    device = "cpu"
+
+    # Tentar GPU apenas se disponível E se conseguir fazer inference; o
+    # resultado do teste fica em cache por host + versão do torch/CUDA
+    if torch.cuda.is_available():
+        def cuda_inference_works():
+            try:
+                model.to("cuda")
+                test_frame = np.zeros((640, 640, 3), dtype=np.uint8)
+                _ = model(test_frame, verbose=False, device="cuda")
+                return True
+            except Exception as e:
+                print(f"⚠️  CUDA unavailable para YOLO: {type(e).__name__}")
+                return False
+
+        if cached_probe("yolo_cuda", f"torch {torch.__version__} cuda {torch.version.cuda}",
+                        cuda_inference_works):
+            device = "cuda"
+            print("⛩  YOLO carregado na GPU")
+        else:
+            print("   Continuando com YOLO na CPU")
+
+    model.to(device)
+
+    PERSON_CLASS = next(
+        (int(k) for k, name in model.names.items() if name == "person"), 0
+    )
+    return model
+
+
+# pular alguns quadros para ganhar desempenho (amostragem)
+SKIP_FRAMES = 2  # analisa apenas a cada 2 quadros
+
+# amostragem do analyze_scene (modo per_scene): "adaptive" escolhe os quadros
+# por tempo; "frames" mantém um quadro a cada SKIP_FRAMES
+SCENE_SAMPLING = os.getenv("SCENE_SAMPLING", "adaptive")
+# amostras por segundo em trechos parados e onde a diferença de quadros indica mudança
+SAMPLE_RATE = float(os.getenv("SAMPLE_RATE", "4"))
+SAMPLE_RATE_ACTIVE = float(os.getenv("SAMPLE_RATE_ACTIVE", "15"))
+# máximo de amostras por cena (cenas longas ficam com amostras mais espaçadas)
+SAMPLE_BUDGET = int(os.getenv("SAMPLE_BUDGET", "120"))
+# diferença média entre amostras (0-255, na distância de SKIP_FRAMES) que marca trecho ativo
+ACTIVITY_DIFF = float(os.getenv("ACTIVITY_DIFF", "4"))
+# parada antecipada: variação relativa do score entre dois lotes do YOLO; 0 desativa
+SCORE_STABLE_TOL = float(os.getenv("SCORE_STABLE_TOL", "0.02"))
+# saltos maiores que isso (quadros) viram seek em vez de grab()
+SEEK_MIN_GAP = int(os.getenv("SEEK_MIN_GAP", "90"))
+
+# cenas mais longas que LONG_SCENE segundos viram só a sua melhor janela de
+# HIGHLIGHT_WINDOW segundos (modo single_pass); HIGHLIGHT_WINDOW=0 desativa
+HIGHLIGHT_WINDOW = float(os.getenv("HIGHLIGHT_WINDOW", "8"))
+LONG_SCENE = float(os.getenv("LONG_SCENE", "20"))
+
+# trilha do enquadramento vertical: centro das pessoas a cada SUBJECT_TRACK_STEP
+# segundos, suavizado com média móvel de SUBJECT_SMOOTH pontos
+SUBJECT_TRACK_STEP = float(os.getenv("SUBJECT_TRACK_STEP", "1.0"))
+SUBJECT_SMOOTH = int(os.getenv("SUBJECT_SMOOTH", "3"))
+
+# detecção de pessoas em lote: quadros por chamada e resolução de inferência
+DETECT_BATCH_SIZE = int(os.getenv("DETECT_BATCH_SIZE", "16"))
+DETECT_IMGSZ = int(os.getenv("DETECT_IMGSZ", "640"))
+
+# pesos do score; sobrescreva com SCORE_WEIGHTS='{"people": 200}' e rode de
+# novo: com o store de features a re-pontuação não decodifica nada
+SCORE_WEIGHTS = {
+    "sharpness": 0.4,
+    "brightness": 0.1,
+    "people": 120,
+    "smooth_bonus": 200,
+    "instability_penalty": 150,
+    "motion_penalty": 0.2,
+}
+SCORE_WEIGHTS.update(json.loads(os.getenv("SCORE_WEIGHTS", "{}")))
 
 
 def sharpness_score(frame):
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    return cv2.Laplacian(gray, cv2.CV_64F).var()
+    return sharpness_from_gray(gray)
 
 
 def brightness_score(frame):
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return brightness_from_gray(gray)
+
+
+def sharpness_from_gray(gray):
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+
+def brightness_from_gray(gray):
     return np.mean(gray)
 
 
-def people_score(frame):
-    results = model(frame, verbose=False, device=device)
-    count = 0
+def count_people(result):
+    """Conta a classe pessoa comparando o tensor de classes de uma vez"""
+    if result.boxes is None or len(result.boxes) == 0:
+        return 0
+    return int((result.boxes.cls == PERSON_CLASS).sum().item())
 
-    for r in results:
-        for box in r.boxes:
-            cls = int(box.cls[0])
-            if model.names[cls] == "person":
-                count += 1
 
-    return count
+def people_center(result):
+    """Centro horizontal (0-1) das pessoas, ponderado pela área; NaN sem pessoas"""
+    if result.boxes is None or len(result.boxes) == 0:
+        return np.nan
+    mask = result.boxes.cls == PERSON_CLASS
+    if not bool(mask.any()):
+        return np.nan
+    xywhn = result.boxes.xywhn[mask].cpu().numpy()
+    return float(np.average(xywhn[:, 0], weights=xywhn[:, 2] * xywhn[:, 3]))
 
 
-def analyze_scene(video_path, start, end):
-    print(f"   → analisando cena {start:.2f}-{end:.2f}")
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
+def people_score(frame):
+    detector = load_detector()
+    if detector_backend != "torch":
+        return detector.count_people([frame])[0]
+    results = detector(frame, verbose=False, device=device)
+    return sum(count_people(r) for r in results)
 
-    cap.set(cv2.CAP_PROP_POS_FRAMES, int(start * fps))
 
-    total_score = 0
-    frame_count = 0
-    prev_gray = None
-    motion_penalty = 0
+def prepare_detection_frame(frame, imgsz=DETECT_IMGSZ):
+    """Reduz o quadro para o lado maior = imgsz antes de entrar no lote"""
+    h, w = frame.shape[:2]
+    scale = imgsz / max(h, w)
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
 
-    # pular alguns quadros para ganhar desempenho (amostragem)
-    SKIP_FRAMES = 2  # analisa apenas a cada 2 quadros
 
-    while cap.get(cv2.CAP_PROP_POS_MSEC) / 1000 < end:
-        ret, frame = cap.read()
-        if not ret:
-            break
+def people_batch(frames, imgsz=DETECT_IMGSZ):
+    """Uma chamada do detector para o lote inteiro; (pessoas, centro x 0-1) por quadro"""
+    if not frames:
+        return []
+    detector = load_detector()
+    if detector_backend != "torch":
+        return detector.detect_people(frames)
+    results = detector(frames, verbose=False, device=device, imgsz=imgsz)
+    return [(count_people(r), people_center(r)) for r in results]
 
-        if frame_count % SKIP_FRAMES != 0:
-            frame_count += 1
-            continue
 
-        sharp = sharpness_score(frame)
-        bright = brightness_score(frame)
-        people = people_score(frame)
+def people_scores_batch(frames, imgsz=DETECT_IMGSZ):
+    """Contagem de pessoas por quadro do lote"""
+    return [count for count, _ in people_batch(frames, imgsz)]
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-        if prev_gray is not None:
-            diff = cv2.absdiff(prev_gray, gray)
-            motion_penalty += np.mean(diff)
+class PeopleBatcher:
+    """Acumula quadros amostrados (de qualquer cena) em lotes de tamanho fixo.
 
-        prev_gray = gray
+    `add` guarda o quadro já reduzido; ao completar `batch_size` roda a
+    detecção. `counts` devolve {frame_idx: pessoas} e `centers`
+    {frame_idx: centro x das pessoas} após o `flush` final.
+    """
 
-        score = (
-            sharp * 0.4 +
-            bright * 0.1 +
-            people * 120 
-        )
+    def __init__(self, batch_size=DETECT_BATCH_SIZE, imgsz=DETECT_IMGSZ):
+        self.batch_size = max(1, batch_size)
+        self.imgsz = imgsz
+        self.pending_idx = []
+        self.pending_frames = []
+        self.counts = {}
+        self.centers = {}
+        self.inference_s = 0.0
 
-        total_score += score
-        frame_count += 1
+    def add(self, frame_idx, frame):
+        self.pending_idx.append(frame_idx)
+        self.pending_frames.append(prepare_detection_frame(frame, self.imgsz))
+        if len(self.pending_frames) >= self.batch_size:
+            self.flush()
 
-    cap.release()
+    def flush(self):
+        started = time.perf_counter()
+        detections = people_batch(self.pending_frames, imgsz=self.imgsz)
+        self.inference_s += time.perf_counter() - started
+        for frame_idx, (count, center) in zip(self.pending_idx, detections):
+            self.counts[frame_idx] = count
+            self.centers[frame_idx] = center
+        self.pending_idx = []
+        self.pending_frames = []
 
-    if frame_count == 0:
-        return 0
 
-    avg_base_score = total_score / frame_count
-    avg_motion_penalty = motion_penalty / frame_count
-    cam_motion, cam_instability = analyze_camera_motion(video_path, start, end)
+def base_frame_score(sharp, bright, people, weights=SCORE_WEIGHTS):
+    return (
+        sharp * weights["sharpness"] +
+        bright * weights["brightness"] +
+        people * weights["people"]
+    )
 
 
-    instability_penalty = cam_instability * 150
+def combine_scene_score(avg_base_score, avg_motion_penalty, cam_motion, cam_instability,
+                        weights=SCORE_WEIGHTS):
+    instability_penalty = cam_instability * weights["instability_penalty"]
     smooth_bonus = 0
     if 0.5 < cam_motion < 5 and cam_instability < 1.5:
-        smooth_bonus = 200
+        smooth_bonus = weights["smooth_bonus"]
 
     final_score = (
         avg_base_score
         + smooth_bonus
         - instability_penalty
-        - (avg_motion_penalty * 0.2)
+        - (avg_motion_penalty * weights["motion_penalty"])
     )
 
-    return final_score
\ No newline at end of file
+    return final_score
+
+
+class SceneSampler:
+    """Decide quantos quadros avançar até a próxima amostra da cena.
+
+    No modo "frames" o passo é sempre SKIP_FRAMES. No "adaptive" o passo vem
+    do tempo (SAMPLE_RATE, ou SAMPLE_RATE_ACTIVE quando a última diferença de
+    quadros passou de ACTIVITY_DIFF) e nunca é menor que o necessário para
+    cobrir o resto da cena com o que sobra de SAMPLE_BUDGET.
+    """
+
+    def __init__(self, fps, frame_count, mode=SCENE_SAMPLING):
+        self.adaptive = mode == "adaptive"
+        self.frame_count = frame_count
+        self.budget = max(1, SAMPLE_BUDGET)
+        self.idle_gap = max(1, int(round(fps / SAMPLE_RATE)))
+        self.active_gap = max(1, int(round(fps / SAMPLE_RATE_ACTIVE)))
+
+    def next_gap(self, position, samples, activity):
+        if not self.adaptive:
+            return SKIP_FRAMES
+
+        remaining_samples = self.budget - samples
+        if remaining_samples <= 0:
+            return self.frame_count - position
+
+        gap = self.active_gap if activity >= ACTIVITY_DIFF else self.idle_gap
+        remaining_frames = self.frame_count - position
+        return max(gap, int(np.ceil(remaining_frames / remaining_samples)))
+
+
+def advance_capture(cap, position, target):
+    """Leva o cap até `target` sem decodificar para BGR os quadros pulados"""
+    skip = target - position
+    if skip > SEEK_MIN_GAP:
+        return cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+    for _ in range(skip):
+        if not cap.grab():
+            return False
+    return True
+
+
+def analyze_scene(video_path, start, end):
+    """Score da cena (ver `analyze_scene_motion`)"""
+    return analyze_scene_motion(video_path, start, end)[0]
+
+
+def analyze_scene_motion(video_path, start, end):
+    """(score, (cam_motion, cam_instability)) lendo só os quadros escolhidos pelo SceneSampler.
+
+    Cada amostra pesa pelos quadros que representa; as médias são
+    normalizadas como no laço antigo (que dividia por todos os quadros lidos
+    amostrando a cada SKIP_FRAMES), então o modo "frames" dá o mesmo score e
+    o "adaptive" fica na mesma escala. No "adaptive" o movimento de câmera
+    também sai das amostras (cada uma lê também o quadro seguinte para o
+    fluxo, e para junto com a parada antecipada); o "frames" mantém o
+    `analyze_camera_motion` sobre a cena inteira. O movimento volta junto
+    com o score para o render decidir com os mesmos valores.
+    """
+    print(f"   → analisando cena {start:.2f}-{end:.2f}")
+    with stage("analyze_scene", video=video_path, start=start, end=end) as metrics:
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or int(round(end * fps))
+
+        start_frame = int(round(start * fps))
+        end_frame = min(int(round(end * fps)), total_frames)
+        sampler = SceneSampler(fps, end_frame - start_frame)
+
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        position = start_frame  # próximo quadro que o cap devolve
+        target = start_frame
+        decoded = 0
+        next_frame = None  # quadro seguinte à amostra, lido para o fluxo da câmera
+
+        samples = {}  # quadro → (peso em quadros, score sem pessoas)
+        weighted_motion = 0
+        covered = 0
+        prev_gray = None
+        prev_target = None
+        stable_score = None
+        stopped_early = False
+        people = PeopleBatcher()
+        camera = SampledCameraMotion() if sampler.adaptive else None
+
+        def weighted_score(frames):
+            return sum(
+                samples[i][0] * (samples[i][1] + base_frame_score(0, 0, people.counts.get(i, 0)))
+                for i in frames
+            )
+
+        while target < end_frame:
+            if next_frame is not None and position == target + 1:
+                frame = next_frame
+            else:
+                if not advance_capture(cap, position, target):
+                    break
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                decoded += 1
+                position = target + 1
+            next_frame = None
+
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+            activity = 0
+            if prev_gray is not None:
+                # diferença levada à distância de SKIP_FRAMES quadros
+                activity = np.mean(cv2.absdiff(prev_gray, gray)) * SKIP_FRAMES / (target - prev_target)
+                weighted_motion += activity * (target - prev_target)
+            prev_gray = gray
+            prev_target = target
+
+            gap = sampler.next_gap(target - start_frame, len(samples), activity)
+            weight = min(gap, end_frame - target)
+            if camera is not None and target + 1 < end_frame:
+                ret, next_frame = cap.read()
+                if ret:
+                    decoded += 1
+                    position = target + 2
+                    camera.add(frame, next_frame, weight)
+                else:
+                    next_frame = None
+            sharp = sharpness_from_gray(gray)
+            bright = brightness_from_gray(gray)
+            samples[target] = (weight, base_frame_score(sharp, bright, 0))
+            covered += weight
+
+            analyzed_before = len(people.counts)
+            people.add(target, frame)
+            if sampler.adaptive and SCORE_STABLE_TOL > 0 and len(people.counts) > analyzed_before:
+                # um lote do YOLO acabou de rodar: compara a média parcial com a do lote anterior
+                current = weighted_score(people.counts) / sum(samples[i][0] for i in people.counts)
+                if stable_score is not None and \
+                        abs(current - stable_score) <= SCORE_STABLE_TOL * max(abs(stable_score), 1):
+                    stopped_early = True
+                    break
+                stable_score = current
+
+            target += gap
+
+        cap.release()
+        people.flush()
+
+        metrics.update(
+            frames_decoded=decoded,
+            frames_analyzed=len(people.counts),
+            frames_covered=covered,
+            stopped_early=stopped_early,
+            inference_s=round(people.inference_s, 3),
+        )
+
+        if covered == 0:
+            return 0, None
+
+        avg_base_score = weighted_score(samples) / (covered * SKIP_FRAMES)
+        avg_motion_penalty = weighted_motion / (covered * SKIP_FRAMES)
+        if camera is not None:
+            cam_motion, cam_instability = camera.result()
+        else:
+            cam_motion, cam_instability = analyze_camera_motion(video_path, start, end)
+
+        score = combine_scene_score(avg_base_score, avg_motion_penalty, cam_motion, cam_instability)
+        metrics["score"] = score
+        return score, (cam_motion, cam_instability)
+
+
+def init_scoring_worker(num_threads):
+    """Inicializador do pool de processos: limita threads e carrega o YOLO uma vez"""
+    set_analysis_threads(num_threads)
+    load_detector(num_threads)
+
+
+def score_scene_task(task):
+    """(video_path, start, end) → (score, movimento de câmera, erro); não propaga exceção para o pool"""
+    video_path, start, end = task
+    try:
+        return (*analyze_scene_motion(video_path, start, end), None)
+    except Exception as e:
+        return 0, None, str(e)
+
+
+class SceneContentConsumer(FrameConsumer):
+    """Nitidez, brilho e pessoas nos quadros amostrados (a cada SKIP_FRAMES).
+
+    Quadros não amostrados ficam como NaN nas colunas.
+    """
+
+    def __init__(self, step=SKIP_FRAMES):
+        self.step = step
+        self.sharpness = []
+        self.brightness = []
+        self.people = []
+        self.people_x = []
+        self.batcher = PeopleBatcher()
+
+    def process(self, frame_idx, frame, gray):
+        if frame_idx % self.step != 0:
+            self.sharpness.append(np.nan)
+            self.brightness.append(np.nan)
+            return
+
+        self.sharpness.append(sharpness_from_gray(gray))
+        self.brightness.append(brightness_from_gray(gray))
+        self.batcher.add(frame_idx, frame)
+
+    def finish(self, frame_count):
+        self.batcher.flush()
+        self.people = np.full(frame_count, np.nan)
+        self.people_x = np.full(frame_count, np.nan)
+        for frame_idx, count in self.batcher.counts.items():
+            self.people[frame_idx] = count
+            self.people_x[frame_idx] = self.batcher.centers[frame_idx]
+        self.sharpness = np.asarray(self.sharpness, dtype=np.float64)
+        self.brightness = np.asarray(self.brightness, dtype=np.float64)
+
+    def columns(self):
+        return {
+            "sharpness": self.sharpness,
+            "brightness": self.brightness,
+            "people": self.people,
+            "people_x": self.people_x,
+        }
+
+    def load_columns(self, columns, frame_count):
+        self.sharpness = columns["sharpness"]
+        self.brightness = columns["brightness"]
+        self.people = columns["people"]
+        # stores antigos não têm a posição: enquadramento vertical no centro
+        self.people_x = columns.get("people_x", np.full(frame_count, np.nan))
+
+    def aggregate(self, start_frame, end_frame):
+        sharpness = self.sharpness[start_frame:end_frame]
+        sampled = ~np.isnan(sharpness)
+        return {
+            "samples": int(np.count_nonzero(sampled)),
+            "sharpness_sum": float(np.sum(sharpness[sampled])),
+            "brightness_sum": float(np.nansum(self.brightness[start_frame:end_frame])),
+            "people_sum": float(np.nansum(self.people[start_frame:end_frame])),
+        }
+
+
+def score_scene_stats(stats, weights=SCORE_WEIGHTS):
+    """Score da cena a partir dos agregados do StreamingDecoder.
+
+    Usa as mesmas médias do `analyze_scene` (divididas pelo total de quadros
+    da cena) para que os dois caminhos gerem o mesmo ranking.
+    """
+    if stats["frames"] == 0 or stats["samples"] == 0:
+        return 0
+
+    base_score_sum = base_frame_score(
+        stats["sharpness_sum"], stats["brightness_sum"], stats["people_sum"], weights
+    )
+    avg_base_score = base_score_sum / stats["frames"]
+    avg_motion_penalty = stats["motion_penalty"] / stats["frames"]
+
+    return combine_scene_score(
+        avg_base_score, avg_motion_penalty,
+        stats["cam_motion"], stats["cam_instability"],
+        weights
+    )
+
+
+def frame_score_column(columns, weights=SCORE_WEIGHTS):
+    """Score aditivo por quadro a partir das colunas do store.
+
+    A soma numa janela, dividida pelo número de quadros, é o score da janela
+    sem o bônus de suavidade (que não é aditivo). Quadros não amostrados
+    contam 0, como nas médias do `score_scene_stats`.
+    """
+    scores = base_frame_score(
+        np.nan_to_num(columns["sharpness"]),
+        np.nan_to_num(columns["brightness"]),
+        np.nan_to_num(columns["people"]),
+        weights,
+    )
+    scores = scores - np.nan_to_num(columns["frame_diff"]) * weights["motion_penalty"]
+    # o estimador esparso não tem tremedeira por quadro
+    if "flow_std" in columns:
+        scores = scores - np.nan_to_num(columns["flow_std"]) * weights["instability_penalty"]
+    return scores
+
+
+def best_window_start(frame_scores, start_frame, end_frame, window_frames):
+    """Primeiro quadro da janela de maior soma dentro da cena, em O(n)"""
+    prefix = np.concatenate(([0.0], np.cumsum(frame_scores[start_frame:end_frame])))
+    window_sums = prefix[window_frames:] - prefix[:-window_frames]
+    return start_frame + int(np.argmax(window_sums))
+
+
+def best_windows(decoder, scenes, weights=SCORE_WEIGHTS, window=HIGHLIGHT_WINDOW,
+                 long_scene=LONG_SCENE):
+    """Troca cada cena longa pela sua melhor janela de `window` segundos"""
+    if not window:
+        return scenes
+
+    window_frames = max(1, int(round(window * decoder.fps)))
+    frame_scores = None
+    windows = []
+    for start, end in scenes:
+        start_frame, end_frame = decoder.frame_range(start, end)
+        if end - start <= long_scene or end_frame - start_frame <= window_frames:
+            windows.append((start, end))
+            continue
+
+        if frame_scores is None:
+            frame_scores = frame_score_column(decoder.columns(), weights)
+        best = best_window_start(frame_scores, start_frame, end_frame, window_frames)
+        window_start = best / decoder.fps
+        window_end = (best + window_frames) / decoder.fps
+        print(f"   ✂️  Cena longa {start:.2f}-{end:.2f} → janela {window_start:.2f}-{window_end:.2f}")
+        windows.append((window_start, window_end))
+
+    return windows
+
+
+def subject_track(people_x, fps, step=SUBJECT_TRACK_STEP, smooth=SUBJECT_SMOOTH):
+    """Centro horizontal (0-1) das pessoas ao longo da cena, em pontos igualmente espaçados.
+
+    Trechos sem detecção são interpolados entre os vizinhos (e repetem a
+    borda); sem nenhuma detecção a trilha fica no centro do quadro.
+    """
+    points = max(1, int(round(len(people_x) / (step * fps))))
+    values = np.array([
+        np.nanmean(chunk) if np.any(~np.isnan(chunk)) else np.nan
+        for chunk in np.array_split(people_x, points)
+    ])
+
+    known = ~np.isnan(values)
+    if not known.any():
+        return [0.5] * points
+
+    values = np.interp(np.arange(points), np.flatnonzero(known), values[known])
+    values = moving_average(values[:, None], smooth)[:, 0]
+    return [round(float(v), 3) for v in values]
+
+
+def loaded_detector_id():
+    """Id do detector em uso neste processo (torch depois de um fallback).
+
+    Não carrega o modelo: antes da primeira detecção é o configurado.
+    """
+    return detector_id(detector_backend)
+
+
+def analysis_params(threshold):
+    """Parâmetros que alteram as features por quadro (chave do store)"""
+    return {
+        "threshold": threshold,
+        "scene_downscale": SCENE_DOWNSCALE,
+        "skip_frames": SKIP_FRAMES,
+        "detect_imgsz": DETECT_IMGSZ,
+        "analysis_width": ANALYSIS_WIDTH,
+        "camera_motion": CAMERA_MOTION_ESTIMATOR,
+        "detector": detector_id(),
+    }
+
+
+def analyze_video(video_path, threshold=SCENE_THRESHOLD, weights=SCORE_WEIGHTS):
+    """Detecta e avalia todas as cenas decodificando o vídeo uma única vez.
+
+    As features por quadro ficam no store em disco; se o mesmo vídeo já foi
+    analisado com os mesmos parâmetros, só a pontuação é refeita.
+
+    Retorna uma lista de dicts (start, end, score, cam_motion,
+    cam_instability, subject_x, ...) na ordem das cenas.
+    """
+    decoder = StreamingDecoder(video_path)
+    cuts = decoder.register(SceneCutConsumer(threshold=threshold))
+    content = decoder.register(SceneContentConsumer())
+    decoder.register(FrameDiffConsumer(step=SKIP_FRAMES))
+    decoder.register(make_camera_motion_consumer())
+
+    params = analysis_params(threshold)
+    path = store_path(video_path, params)
+
+    with stage("analyze_video", video=video_path) as metrics:
+        stored = load_features(path)
+
+        if stored is not None:
+            print(f"♻️  Reaproveitando features de {path} (sem decodificar)")
+            decoder.restore(*stored)
+            metrics.update(from_store=True, frames_decoded=0, frames_analyzed=0)
+        else:
+            decoder.run()
+            # backend exportado caiu para torch: grava sob a chave do torch
+            if loaded_detector_id() != params["detector"]:
+                params = dict(params, detector=loaded_detector_id())
+                path = store_path(video_path, params)
+            save_features(path, decoder.fps, decoder.frame_count, decoder.columns(), params)
+            metrics.update(
+                from_store=False,
+                frames_decoded=decoder.frame_count,
+                frames_analyzed=len(content.batcher.counts),
+                inference_s=round(content.batcher.inference_s, 3),
+            )
+
+        scenes = best_windows(decoder, cuts.scenes(decoder.fps), weights)
+
+        results = decoder.aggregate(scenes)
+        for stats in results:
+            stats["score"] = score_scene_stats(stats, weights)
+            emit("scene", video=video_path, **stats)
+            start_frame, end_frame = decoder.frame_range(stats["start"], stats["end"])
+            stats["subject_x"] = subject_track(content.people_x[start_frame:end_frame], decoder.fps)
+
+        metrics["scenes"] = len(results)
+
+    return results
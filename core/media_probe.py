@@ -0,0 +1,59 @@
+import json
+import subprocess
+from fractions import Fraction
+
+
+def probe_video(path):
+    """Lê via ffprobe as propriedades do primeiro stream de vídeo.
+
+    Retorna dict com codec, width, height, fps, pix_fmt e duration
+    (segundos); None se o ffprobe falhar.
+    """
+    command = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,width,height,avg_frame_rate,r_frame_rate,pix_fmt,duration:format=duration",
+        "-of", "json",
+        path
+    ]
+    try:
+        proc = subprocess.run(command, check=True, capture_output=True, text=True)
+        info = json.loads(proc.stdout)
+        stream = info["streams"][0]
+    except (subprocess.CalledProcessError, ValueError, KeyError, IndexError) as e:
+        print(f"⚠️  ffprobe falhou para {path}: {e}")
+        return None
+
+    rate = stream.get("avg_frame_rate") or stream.get("r_frame_rate") or "0/1"
+    try:
+        fps = float(Fraction(rate))
+    except (ValueError, ZeroDivisionError):
+        fps = 0.0
+
+    return {
+        "codec": stream.get("codec_name"),
+        "width": int(stream.get("width", 0)),
+        "height": int(stream.get("height", 0)),
+        "fps": fps,
+        "pix_fmt": stream.get("pix_fmt"),
+        # duração do stream de vídeo (o container pode incluir áudio mais longo)
+        "duration": float(stream.get("duration") or info.get("format", {}).get("duration", 0) or 0),
+    }
+
+
+def probe_has_audio(path):
+    """True se o arquivo tem ao menos um stream de áudio"""
+    command = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "a",
+        "-show_entries", "stream=index",
+        "-of", "csv=p=0",
+        path
+    ]
+    try:
+        proc = subprocess.run(command, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError:
+        return False
+    return bool(proc.stdout.strip())
@@ -1,6 +1,8 @@
 import cv2
 import numpy as np
 
+from core.decode_engine import FrameConsumer
+
 def calculate_motion_score(video_path, start, end):
     cap = cv2.VideoCapture(video_path)
     fps = cap.get(cv2.CAP_PROP_FPS)
@@ -30,4 +32,43 @@ def calculate_motion_score(video_path, start, end):
     if frame_count == 0:
         return 0
 
-    return motion_score / frame_count
\ No newline at end of file
+    return motion_score / frame_count
+
+
+class FrameDiffConsumer(FrameConsumer):
+    """Diferença média entre quadros amostrados (a cada `step`) para o StreamingDecoder.
+
+    Quadros não amostrados ficam como NaN. No agregado a primeira amostra da
+    cena é descartada, pois sua diferença foi medida contra a cena anterior.
+    """
+
+    def __init__(self, step=1):
+        self.step = step
+        self.prev_gray = None
+        self.frame_diff = []
+
+    def process(self, frame_idx, frame, gray):
+        if frame_idx % self.step != 0 or self.prev_gray is None:
+            self.frame_diff.append(np.nan)
+        else:
+            self.frame_diff.append(np.mean(cv2.absdiff(self.prev_gray, gray)))
+
+        if frame_idx % self.step == 0:
+            self.prev_gray = gray
+
+    def finish(self, frame_count):
+        self.prev_gray = None
+        self.frame_diff = np.asarray(self.frame_diff, dtype=np.float64)
+
+    def columns(self):
+        return {"frame_diff": self.frame_diff}
+
+    def load_columns(self, columns, frame_count):
+        self.frame_diff = columns["frame_diff"]
+
+    def aggregate(self, start_frame, end_frame):
+        diffs = self.frame_diff[start_frame:end_frame]
+        sampled = np.flatnonzero(~np.isnan(diffs))
+        if len(sampled) and sampled[0] < self.step:
+            sampled = sampled[1:]
+        return {"motion_penalty": float(np.sum(diffs[sampled]))}
@@ -0,0 +1,189 @@
+import ast
+import os
+import shutil
+import tempfile
+
+import cv2
+import numpy as np
+
+# backend da detecção de pessoas: "torch" (ultralytics), "onnx" (ONNX Runtime)
+# ou "openvino"; os dois últimos rodam o yolov8n exportado, só em CPU
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "torch")
+# quantização INT8 dinâmica do ONNX (não precisa de dados de calibração)
+DETECTOR_INT8 = os.getenv("DETECTOR_INT8", "0") == "1"
+DETECTOR_WEIGHTS = "yolov8n.pt"
+
+# mesmos limiares do predict do ultralytics, para as contagens baterem
+DETECT_CONF = 0.25
+DETECT_IOU = 0.7
+LETTERBOX_FILL = 114
+
+
+def detector_id(backend=DETECTOR_BACKEND, int8=DETECTOR_INT8, weights=DETECTOR_WEIGHTS):
+    """Identifica o detector na chave do store de features"""
+    if backend == "torch":
+        return weights
+    return f"{weights}:{backend}{':int8' if int8 else ''}"
+
+
+def exported_model_path(weights=DETECTOR_WEIGHTS, int8=False):
+    base = os.path.splitext(weights)[0]
+    return f"{base}.int8.onnx" if int8 else f"{base}.onnx"
+
+
+def is_fresh(artifact, source):
+    """True se `artifact` existe e não é mais antigo que `source`"""
+    if not os.path.exists(artifact):
+        return False
+    return not os.path.exists(source) or os.path.getmtime(artifact) >= os.path.getmtime(source)
+
+
+def export_onnx(weights=DETECTOR_WEIGHTS, int8=DETECTOR_INT8):
+    """Exporta os pesos para ONNX uma única vez e guarda ao lado do .pt.
+
+    A exportação roda numa pasta temporária e o resultado entra com
+    os.replace, então workers exportando ao mesmo tempo não leem arquivo pela
+    metade. Retorna o caminho do modelo (INT8 se pedido).
+    """
+    onnx_path = exported_model_path(weights)
+
+    if not is_fresh(onnx_path, weights):
+        from ultralytics import YOLO
+
+        print(f"📦 Exportando {weights} para ONNX (só na primeira vez)")
+        YOLO(weights)  # baixa os pesos se ainda não existirem
+        workdir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(weights)))
+        try:
+            local_weights = shutil.copy(weights, workdir)
+            # lote e resolução dinâmicos; simplify exigiria pacote extra (rede)
+            exported = YOLO(local_weights).export(format="onnx", dynamic=True, simplify=False)
+            os.replace(exported, onnx_path)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        print(f"✔ Modelo ONNX salvo em {onnx_path}")
+
+    if not int8:
+        return onnx_path
+
+    int8_path = exported_model_path(weights, int8=True)
+    if not is_fresh(int8_path, onnx_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print("📦 Quantizando o modelo ONNX para INT8")
+        tmp_path = f"{int8_path}.{os.getpid()}.tmp"
+        quantize_dynamic(onnx_path, tmp_path, weight_type=QuantType.QUInt8)
+        os.replace(tmp_path, int8_path)
+        print(f"✔ Modelo INT8 salvo em {int8_path}")
+
+    return int8_path
+
+
+def letterbox(frame, imgsz):
+    """Redimensiona mantendo a proporção e centraliza num quadrado imgsz×imgsz"""
+    h, w = frame.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((imgsz, imgsz, 3), LETTERBOX_FILL, dtype=np.uint8)
+    top = (imgsz - new_h) // 2
+    left = (imgsz - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = frame
+    return canvas
+
+
+def person_boxes(prediction, person_class, conf=DETECT_CONF, iou=DETECT_IOU):
+    """Caixas (cx, cy, w, h) de pessoas numa saída crua do YOLOv8 (4 + classes, âncoras).
+
+    Cada caixa fica com a classe de maior confiança, como no NMS do
+    ultralytics; sobram as de pessoa acima de `conf`, depois do NMS por IoU.
+    """
+    prediction = prediction.T
+    class_scores = prediction[:, 4:]
+    best_class = class_scores.argmax(axis=1)
+    best_conf = class_scores.max(axis=1)
+    keep = (best_class == person_class) & (best_conf > conf)
+    if not keep.any():
+        return np.empty((0, 4))
+
+    boxes = prediction[keep, :4]
+    cx, cy, w, h = boxes.T
+    corner_boxes = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+    indices = cv2.dnn.NMSBoxes(corner_boxes.tolist(), best_conf[keep].tolist(), conf, iou)
+    return boxes[np.asarray(indices, dtype=int).ravel()]
+
+
+class ExportedPersonDetector:
+    """YOLOv8 exportado (ONNX) no ONNX Runtime ou no OpenVINO, só CPU.
+
+    Reproduz o pré e o pós-processamento do ultralytics (letterbox, limiar de
+    confiança, NMS) para contar pessoas com o mesmo critério do backend torch.
+    """
+
+    def __init__(self, model_path, backend="onnx", imgsz=640, num_threads=0):
+        self.imgsz = imgsz
+        self.person_class = 0  # COCO
+
+        if backend == "openvino":
+            import openvino as ov
+
+            core = ov.Core()
+            config = {"INFERENCE_NUM_THREADS": num_threads} if num_threads else {}
+            compiled = core.compile_model(core.read_model(model_path), "CPU", config)
+            output = compiled.output(0)
+            self.infer = lambda batch: compiled(batch)[output]
+        else:
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            if num_threads:
+                options.intra_op_num_threads = num_threads
+            session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+            input_name = session.get_inputs()[0].name
+            self.infer = lambda batch: session.run(None, {input_name: batch})[0]
+
+            # o ultralytics grava os nomes das classes nos metadados do ONNX
+            names = session.get_modelmeta().custom_metadata_map.get("names")
+            if names:
+                self.person_class = next(
+                    (int(k) for k, name in ast.literal_eval(names).items() if name == "person"), 0
+                )
+
+    def detect_people(self, frames):
+        """(pessoas, centro horizontal 0-1 ou NaN) por quadro BGR, numa inferência para o lote"""
+        if not frames:
+            return []
+        batch = np.stack([letterbox(frame, self.imgsz) for frame in frames])
+        batch = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+        predictions = self.infer(batch)
+
+        detections = []
+        for frame, prediction in zip(frames, predictions):
+            boxes = person_boxes(prediction, self.person_class)
+            if len(boxes) == 0:
+                detections.append((0, np.nan))
+                continue
+            # desfaz o letterbox para ter x relativo à largura do quadro
+            h, w = frame.shape[:2]
+            new_w = int(round(w * min(self.imgsz / h, self.imgsz / w)))
+            left = (self.imgsz - new_w) // 2
+            center = np.average((boxes[:, 0] - left) / new_w, weights=boxes[:, 2] * boxes[:, 3])
+            detections.append((len(boxes), float(np.clip(center, 0, 1))))
+        return detections
+
+    def count_people(self, frames):
+        return [count for count, _ in self.detect_people(frames)]
+
+
+def load_exported_detector(backend=DETECTOR_BACKEND, int8=DETECTOR_INT8, imgsz=640, num_threads=0):
+    """Exporta (se preciso) e abre o detector; None se o backend não estiver disponível"""
+    try:
+        model_path = export_onnx(int8=int8)
+        detector = ExportedPersonDetector(model_path, backend, imgsz, num_threads)
+    except Exception as e:
+        print(f"⚠️  Backend {backend} indisponível ({type(e).__name__}: {e}) — usando PyTorch")
+        return None
+
+    print(f"⛩  YOLO carregado via {backend}{' INT8' if int8 else ''} ({model_path})")
+    return detector
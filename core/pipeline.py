@@ -0,0 +1,169 @@
+import os
+import queue
+import threading
+
+from core.highlight_builder import (
+    RENDER_MODE, export_formats, plan_highlight, precache_clip, resolve_lut
+)
+from core.resources import slot
+from core.telemetry import emit
+from core.timeline import VirtualTimeline
+
+# "streaming": normalização, análise e render especulativo sobrepostos em
+# filas limitadas; "barrier": uma etapa inteira de cada vez (fluxo antigo)
+PIPELINE = os.getenv("PIPELINE", "streaming")
+# itens prontos aguardando a etapa seguinte; a etapa anterior espera quando
+# a fila enche, então a normalização não corre muito à frente da análise
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))
+# codifica no cache de clipes as cenas que já estão no top enquanto a análise
+# continua (só com RENDER_MODE=cached); SPECULATIVE_RENDER=0 desliga
+SPECULATIVE_RENDER = os.getenv("SPECULATIVE_RENDER", "1") == "1"
+
+DONE = object()
+
+
+class StageFailure:
+    """Erro de um item; atravessa as etapas seguintes até quem consome o fim"""
+
+    def __init__(self, item, error):
+        self.item = item
+        self.error = error
+
+
+def run_stage(work, inbox, outbox, workers=1, name="stage"):
+    """Inicia `workers` threads que aplicam `work` aos itens de `inbox`.
+
+    Os resultados vão para `outbox` na ordem em que terminam. A sentinela
+    DONE marca o fim da entrada e só é repassada depois que todos os workers
+    terminaram; falhas viram StageFailure e seguem adiante sem processar.
+    """
+    workers = max(1, workers)
+    remaining = [workers]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            item = inbox.get()
+            if item is DONE:
+                inbox.put(DONE)  # acorda os outros workers da etapa
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    outbox.put(DONE)
+                return
+            if isinstance(item, StageFailure):
+                outbox.put(item)
+                continue
+            try:
+                result = work(item)
+            except Exception as e:
+                print(f"⚠️  Falha na etapa {name}: {e}")
+                result = StageFailure(item, e)
+            outbox.put(result)
+
+    threads = [threading.Thread(target=worker, name=f"{name}-{n}", daemon=True) for n in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def drain(inbox):
+    """Itera os resultados de uma etapa até a sentinela DONE"""
+    while True:
+        item = inbox.get()
+        if item is DONE:
+            return
+        yield item
+
+
+class SpeculativeRenderer:
+    """Render antecipado das cenas candidatas durante a análise.
+
+    A cada arquivo analisado o top provisório é recalculado e as cenas novas
+    nele entram numa fila; um worker as codifica no cache de clipes. A
+    seleção final continua sendo feita no fim: candidatos que saíram do top
+    antes da vez deles são ignorados, e os já codificados e não usados só
+    ocupam cache (removidos pelo LRU).
+    """
+
+    def __init__(self, top_count, enabled=True):
+        self.top_count = top_count
+        self.enabled = enabled and SPECULATIVE_RENDER and RENDER_MODE == "cached"
+        self.scenes = []
+        self.queued = set()
+        self.wanted = set()
+        self.stopped = False
+        self.lock = threading.Lock()
+        self.inbox = queue.Queue()
+        self.hashes = {}
+        self.encoded = 0
+        self.thread = None
+        if not self.enabled:
+            return
+
+        try:
+            self.lut_path = resolve_lut()
+        except FileNotFoundError as e:
+            print(f"⚠️  Render especulativo desativado: {e}")
+            self.enabled = False
+            return
+        self.formats = export_formats()
+        self.thread = threading.Thread(target=self._worker, name="speculative-render", daemon=True)
+        self.thread.start()
+
+    def add(self, path, scenes):
+        """Registra as cenas (tempos locais) de um arquivo recém-analisado"""
+        if not self.enabled:
+            return
+
+        self.scenes += [(stats["score"], path, stats) for stats in scenes]
+        ranked = sorted(self.scenes, key=lambda s: s[0], reverse=True)
+        ranked = ranked[:self.top_count(len(self.scenes))]
+
+        with self.lock:
+            self.wanted = {(path, stats["start"], stats["end"]) for _, path, stats in ranked}
+        for _, path, stats in ranked:
+            key = (path, stats["start"], stats["end"])
+            if key not in self.queued:
+                self.queued.add(key)
+                self.inbox.put((key, path, stats))
+
+    def _worker(self):
+        while True:
+            item = self.inbox.get()
+            if item is DONE:
+                return
+            key, path, stats = item
+            with self.lock:
+                if self.stopped or key not in self.wanted:
+                    continue
+            try:
+                self._encode(path, stats)
+            except Exception as e:
+                print(f"⚠️  Render especulativo desativado: {e}")
+                with self.lock:
+                    self.stopped = True
+
+    def _encode(self, path, stats):
+        timeline = VirtualTimeline([path], durations=[float("inf")])
+        scene = (stats["start"], stats["end"])
+        camera_motion = {scene: (stats["cam_motion"], stats["cam_instability"])}
+        subject_tracks = {scene: stats["subject_x"]} if "subject_x" in stats else None
+        # vazio se a cena seria descartada por tremedeira
+        for clip in plan_highlight(timeline, [scene], camera_motion, subject_tracks, verbose=False):
+            with slot("encode", speculative=True):
+                self.encoded += precache_clip(clip, self.formats, self.lut_path, self.hashes)
+
+    def finish(self):
+        """Encerra a especulação: descarta a fila e espera o clipe em andamento"""
+        if self.thread is None:
+            return
+        with self.lock:
+            self.stopped = True
+        self.inbox.put(DONE)
+        self.thread.join()
+        self.thread = None
+        if self.encoded:
+            print(f"🏎  Render especulativo: {self.encoded} clipe(s) codificados durante a análise")
+        emit("speculative_render", encoded=self.encoded, candidates=len(self.queued))
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from core.telemetry import emit
+
+# vagas por recurso, compartilhadas por todos os jobs do processo:
+# "encode" (ffmpeg reencodando), "analysis" (decode + inferência) e "io"
+# (cópias, remux, stream copy). 0 = sem limite (execução avulsa do main.py)
+RESOURCE_SLOTS = {
+    "encode": int(os.getenv("ENCODE_SLOTS", "0")),
+    "analysis": int(os.getenv("ANALYSIS_SLOTS", "0")),
+    "io": int(os.getenv("IO_SLOTS", "0")),
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# núcleos repartidos entre as etapas (0 = todos os da máquina); em nós de
+# render compartilhados, deixe só a parte reservada para este processo
+CPU_BUDGET = int(os.getenv("CPU_BUDGET", "0"))
+# fração do orçamento para decode + inferência; o resto vai para os ffmpegs
+ANALYSIS_SHARE = float(os.getenv("ANALYSIS_SHARE", "0.5"))
+# threads de OpenCV/torch por worker de análise quando o número de workers não é fixado
+DEFAULT_WORKER_THREADS = 2
+
+# divisão calculada por configure_threads (núcleos, threads por ffmpeg,
+# workers de análise e threads de cada um)
+THREAD_ALLOCATION = {}
+
+
+def configure_slots(**limits):
+    """Redefine as vagas (ex.: configure_slots(encode=2, analysis=1, io=4))"""
+    with _pools_lock:
+        for name, limit in limits.items():
+            if limit is not None:
+                RESOURCE_SLOTS[name] = limit
+                _pools.pop(name, None)
+
+
+def _pool(name):
+    with _pools_lock:
+        if name not in _pools:
+            limit = RESOURCE_SLOTS.get(name, 0)
+            _pools[name] = threading.BoundedSemaphore(limit) if limit > 0 else None
+        return _pools[name]
+
+
+@contextmanager
+def slot(name, **fields):
+    """Ocupa uma vaga de `name` durante o bloco; emite `slot_wait` se precisou esperar"""
+    pool = _pool(name)
+    if pool is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    pool.acquire()
+    waited = time.perf_counter() - started
+    if waited > 0.01:
+        emit("slot_wait", resource=name, wait_s=round(waited, 3), **fields)
+    try:
+        yield
+    finally:
+        pool.release()
+
+
+def configure_threads(encode_jobs=1, analysis_workers=None, worker_threads=None, report=True):
+    """Reparte CPU_BUDGET entre análise e encode para não sobrecarregar os núcleos.
+
+    Os núcleos de encode são divididos pelos ffmpegs simultâneos (vagas de
+    "encode" ou `encode_jobs`); os de análise pelas filmagens analisando ao
+    mesmo tempo (vagas de "analysis") e depois pelos workers de cada uma.
+    `analysis_workers` / `worker_threads` fixam esses valores.
+    """
+    cores = CPU_BUDGET or os.cpu_count() or 1
+    analysis_cores = max(1, round(cores * ANALYSIS_SHARE))
+    encode_cores = max(1, cores - analysis_cores)
+
+    encode_jobs = RESOURCE_SLOTS["encode"] or max(1, encode_jobs)
+    analysis_jobs = RESOURCE_SLOTS["analysis"] or 1
+    per_shoot = max(1, analysis_cores // analysis_jobs)
+    workers = analysis_workers or max(1, per_shoot // DEFAULT_WORKER_THREADS)
+
+    allocation = {
+        "cores": cores,
+        "encode_jobs": encode_jobs,
+        "ffmpeg_threads": max(1, encode_cores // encode_jobs),
+        "analysis_jobs": analysis_jobs,
+        "analysis_workers": workers,
+        "analysis_threads": worker_threads or max(1, per_shoot // workers),
+    }
+    THREAD_ALLOCATION.clear()
+    THREAD_ALLOCATION.update(allocation)
+
+    if report:
+        print(
+            f"🧮 Orçamento de {cores} núcleo(s): {encode_jobs} ffmpeg(s) × {allocation['ffmpeg_threads']} thread(s), "
+            f"{analysis_jobs} análise(s) × {workers} worker(s) × {allocation['analysis_threads']} thread(s)"
+        )
+        emit("thread_budget", **allocation)
+    return allocation
+
+
+def thread_allocation(name):
+    """Valor da divisão atual; calcula a padrão se ninguém chamou configure_threads"""
+    if not THREAD_ALLOCATION:
+        configure_threads(report=False)
+    return THREAD_ALLOCATION[name]
+
+
+def ffmpeg_thread_args():
+    """Threads de decode e de filtros de um ffmpeg (no lugar de -threads 0).
+
+    `-threads` vale só para a próxima entrada: comandos com várias entradas
+    usam `filter_thread_args` uma vez e `decoder_thread_args` antes de cada -i.
+    """
+    return [*decoder_thread_args(), *filter_thread_args()]
+
+
+def decoder_thread_args():
+    """Threads do decoder de uma entrada (opção por entrada, antes do -i)"""
+    return ["-threads", str(thread_allocation("ffmpeg_threads"))]
+
+
+def filter_thread_args():
+    """Threads dos filtros, globais para o comando"""
+    threads = str(thread_allocation("ffmpeg_threads"))
+    return ["-filter_threads", threads, "-filter_complex_threads", threads]
+
+
+def encoder_thread_args(outputs=1):
+    """Threads do encoder de uma saída; `outputs` saídas dividem a mesma cota"""
+    return ["-threads", str(max(1, thread_allocation("ffmpeg_threads") // outputs))]
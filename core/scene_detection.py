@@ -1,17 +1,113 @@
-from scenedetect import VideoManager, SceneManager
+import csv
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from scenedetect import open_video, SceneManager, StatsManager
 from scenedetect.detectors import ContentDetector
+from scenedetect.scene_detector import FlashFilter
+
+from core.decode_engine import FrameConsumer
+from core.feature_store import video_fingerprint
+from core.resources import thread_allocation
+
+SCENE_THRESHOLD = float(os.getenv("SCENE_THRESHOLD", "30.0"))
+# 0 = automático (largura / 256, padrão do SceneManager)
+SCENE_DOWNSCALE = int(os.getenv("SCENE_DOWNSCALE", "0"))
+# quadros pulados entre análises (incompatível com o arquivo de stats)
+SCENE_FRAME_SKIP = int(os.getenv("SCENE_FRAME_SKIP", "0"))
+# processos para detectar vários arquivos ao mesmo tempo (0 = workers de
+# análise do orçamento de núcleos, core.resources.configure_threads)
+SCENE_JOBS = int(os.getenv("SCENE_JOBS", "0"))
+# salvar/reaproveitar as métricas por quadro do ContentDetector em CSV
+SCENE_STATS = os.getenv("SCENE_STATS", "1") == "1"
+
+MIN_SCENE_LEN = 15
+FRAME_SCORE_KEY = getattr(ContentDetector, "FRAME_SCORE_KEY", "content_val")
+# cortes a menos de MIN_SCENE_LEN quadros do anterior são descartados (o
+# padrão MERGE do scenedetect junta flashes, o que o replay do CSV não refaz)
+FILTER_MODE = FlashFilter.Mode.SUPPRESS
+
+
+def content_detector(threshold=SCENE_THRESHOLD, min_scene_len=MIN_SCENE_LEN):
+    return ContentDetector(threshold=threshold, min_scene_len=min_scene_len, filter_mode=FILTER_MODE)
+
+
+def stats_file_path(video_path, downscale=SCENE_DOWNSCALE):
+    # as métricas dependem do conteúdo e da redução aplicada: um vídeo
+    # regenerado (ex.: merged.mp4) ganha outro arquivo em vez de reusar o antigo
+    fingerprint = video_fingerprint(video_path)[:16]
+    return f"{os.path.splitext(video_path)[0]}.scenestats_{fingerprint}_d{downscale or 'auto'}.csv"
+
 
-def detect_scenes(video_path):
+def cuts_from_stats(stats_path, threshold, min_scene_len=MIN_SCENE_LEN):
+    """Refaz os cortes do ContentDetector a partir do CSV, sem decodificar.
+
+    Passa as métricas pelo mesmo FlashFilter que o detector usa ao vivo, então
+    os cortes batem com os de `content_detector(threshold)`.
+    """
+    flash_filter = FlashFilter(mode=FILTER_MODE, length=min_scene_len)
+    cuts = []
+    first_row = True
+    with open(stats_path, newline="") as f:
+        for row in csv.DictReader(f):
+            # o CSV numera quadros a partir de 1
+            frame_num = int(row["Frame Number"]) - 1
+            if first_row:
+                # o detector não grava métrica do primeiro quadro (não há
+                # anterior para comparar), mas é nele que o filtro começa
+                flash_filter.filter(frame_num=frame_num - 1, above_threshold=False)
+                first_row = False
+            value = row.get(FRAME_SCORE_KEY)
+            above_threshold = bool(value) and float(value) >= threshold
+            cuts += flash_filter.filter(frame_num=frame_num, above_threshold=above_threshold)
+    return cuts
+
+
+def scenes_from_cuts(cuts, frame_count, fps):
+    """Converte cortes (quadros) em (início, fim) em segundos"""
+    if frame_count == 0:
+        return []
+
+    boundaries = [0] + sorted(c for c in set(cuts) if 0 < c < frame_count)
+    boundaries.append(frame_count)
+
+    return [
+        (start_frame / fps, end_frame / fps)
+        for start_frame, end_frame in zip(boundaries, boundaries[1:])
+    ]
+
+
+def detect_scenes(video_path, threshold=SCENE_THRESHOLD, downscale=SCENE_DOWNSCALE,
+                  frame_skip=SCENE_FRAME_SKIP):
     print(f"🔎 Iniciando detecção de cenas em {video_path}")
-    video_manager = VideoManager([video_path])
-    scene_manager = SceneManager()
-    scene_manager.add_detector(ContentDetector(threshold=30.0))
+    video = open_video(video_path)
+    fps = video.frame_rate
+    frame_count = video.duration.get_frames()
+
+    # com frame_skip o PySceneDetect não aceita StatsManager
+    stats_path = stats_file_path(video_path, downscale) if SCENE_STATS and frame_skip == 0 else None
 
-    video_manager.start()
-    scene_manager.detect_scenes(frame_source=video_manager)
+    if stats_path and os.path.exists(stats_path):
+        print(f"♻️  Reaproveitando métricas de {stats_path} (threshold={threshold})")
+        scenes = scenes_from_cuts(cuts_from_stats(stats_path, threshold), frame_count, fps)
+        print(f"✔ {len(scenes)} cenas detectadas")
+        return scenes
 
-    scene_list = scene_manager.get_scene_list()
-    video_manager.release()
+    stats_manager = StatsManager() if stats_path else None
+    scene_manager = SceneManager(stats_manager)
+    if downscale:
+        scene_manager.auto_downscale = False
+        scene_manager.downscale = downscale
+    scene_manager.add_detector(content_detector(threshold))
+
+    scene_manager.detect_scenes(video=video, frame_skip=frame_skip)
+    scene_list = scene_manager.get_scene_list(start_in_scene=True)
+
+    if stats_manager is not None:
+        stats_manager.save_to_csv(stats_path)
 
     scenes = []
     for scene in scene_list:
@@ -20,4 +116,65 @@ def detect_scenes(video_path):
         scenes.append((start, end))
 
     print(f"✔ {len(scenes)} cenas detectadas")
-    return scenes
\ No newline at end of file
+    return scenes
+
+
+def init_scene_worker(num_threads):
+    """Inicializador do pool: limita as threads do OpenCV de cada processo"""
+    cv2.setNumThreads(num_threads)
+
+
+def detect_scenes_many(video_paths, jobs=SCENE_JOBS):
+    """detect_scenes para vários arquivos; com jobs > 1 cada um em um processo"""
+    jobs = jobs or thread_allocation("analysis_workers")
+    if jobs <= 1 or len(video_paths) <= 1:
+        return [detect_scenes(path) for path in video_paths]
+
+    with ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_scene_worker, initargs=(thread_allocation("analysis_threads"),),
+    ) as executor:
+        return list(executor.map(detect_scenes, video_paths))
+
+
+class SceneCutConsumer(FrameConsumer):
+    """ContentDetector alimentado pelo StreamingDecoder em vez do open_video.
+
+    Reduz o quadro como o SceneManager faz por padrão (largura / 256, ou
+    SCENE_DOWNSCALE) para manter o mesmo comportamento do `detect_scenes`.
+    """
+
+    def __init__(self, threshold=SCENE_THRESHOLD, downscale=SCENE_DOWNSCALE):
+        self.detector = content_detector(threshold)
+        self.fixed_downscale = downscale
+        self.downscale = 1
+        self.cuts = []
+        self.frame_count = 0
+
+    def start(self, fps, width, height, scale=1.0):
+        self.downscale = self.fixed_downscale or max(1, width // 256)
+
+    def process(self, frame_idx, frame, gray):
+        if self.downscale > 1:
+            frame = frame[::self.downscale, ::self.downscale, :]
+        self.cuts.extend(self.detector.process_frame(frame_idx, frame))
+
+    def finish(self, frame_count):
+        self.frame_count = frame_count
+        self.cuts.extend(self.detector.post_process(frame_count) or [])
+
+    def columns(self):
+        scene_cut = np.zeros(self.frame_count, dtype=np.uint8)
+        cuts = [c for c in self.cuts if 0 < c < self.frame_count]
+        scene_cut[cuts] = 1
+        return {"scene_cut": scene_cut}
+
+    def load_columns(self, columns, frame_count):
+        self.frame_count = frame_count
+        self.cuts = np.flatnonzero(columns["scene_cut"]).tolist()
+
+    def scenes(self, fps):
+        """Converte os cortes em (início, fim) em segundos"""
+        scenes = scenes_from_cuts(self.cuts, self.frame_count, fps)
+        print(f"✔ {len(scenes)} cenas detectadas")
+        return scenes
@@ -0,0 +1,123 @@
+import math
+import os
+
+import cv2
+import numpy as np
+
+from core.intelligent_analysis import SCORE_WEIGHTS, base_frame_score
+
+# triagem barata antes do analyze_scene (modo per_scene); PREFILTER=0 desativa
+PREFILTER = os.getenv("PREFILTER", "1") == "1"
+# miniaturas lidas por cena e largura delas
+PREFILTER_SAMPLES = int(os.getenv("PREFILTER_SAMPLES", "5"))
+PREFILTER_WIDTH = 160
+# descarte direto: transições curtas, quadro preto/tampa da lente, desfoque extremo
+PREFILTER_MIN_DURATION = float(os.getenv("PREFILTER_MIN_DURATION", "1.0"))
+PREFILTER_MIN_BRIGHTNESS = float(os.getenv("PREFILTER_MIN_BRIGHTNESS", "15"))
+PREFILTER_MIN_SHARPNESS = float(os.getenv("PREFILTER_MIN_SHARPNESS", "8"))
+# corte opcional por ranking: só as `margin` × (cenas do highlight) melhores pelo
+# score barato seguem para a análise completa. 0 (padrão) desliga: o score
+# barato não vê pessoas, que pesam mais que tudo no score real
+PREFILTER_MARGIN = float(os.getenv("PREFILTER_MARGIN", "0"))
+
+
+def thumbnail_gray(frame, width=PREFILTER_WIDTH):
+    h, w = frame.shape[:2]
+    if w > width:
+        frame = cv2.resize(frame, (width, int(round(h * width / w))), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def thumbnail_metrics(cap, fps, start, end, samples=PREFILTER_SAMPLES):
+    """Brilho, nitidez (variância do Laplaciano) e diferença média entre
+    miniaturas espalhadas pela cena; None se nenhum quadro for lido"""
+    brightness = []
+    sharpness = []
+    diffs = []
+    prev = None
+
+    for t in np.linspace(start, end, samples + 2)[1:-1]:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(t * fps))
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        gray = thumbnail_gray(frame)
+        brightness.append(np.mean(gray))
+        sharpness.append(cv2.Laplacian(gray, cv2.CV_64F).var())
+        if prev is not None:
+            diffs.append(np.mean(cv2.absdiff(prev, gray)))
+        prev = gray
+
+    if not brightness:
+        return None
+
+    return {
+        "brightness": float(np.mean(brightness)),
+        "sharpness": float(np.median(sharpness)),
+        "diff": float(np.mean(diffs)) if diffs else 0.0,
+    }
+
+
+def rejection_reason(duration, metrics):
+    """Motivo do descarte direto, ou None se a cena segue na disputa"""
+    if duration < PREFILTER_MIN_DURATION:
+        return f"curta ({duration:.2f}s)"
+    if metrics is None:
+        return "ilegível"
+    if metrics["brightness"] < PREFILTER_MIN_BRIGHTNESS:
+        return f"escura (brilho {metrics['brightness']:.0f})"
+    if metrics["sharpness"] < PREFILTER_MIN_SHARPNESS:
+        return f"desfocada (nitidez {metrics['sharpness']:.1f})"
+    return None
+
+
+def cheap_score(metrics, weights=SCORE_WEIGHTS):
+    """Score só com as métricas das miniaturas, para ordenar os candidatos"""
+    return (
+        base_frame_score(metrics["sharpness"], metrics["brightness"], 0, weights)
+        - metrics["diff"] * weights["motion_penalty"]
+    )
+
+
+def prefilter_scenes(tasks, selection_count, margin=PREFILTER_MARGIN):
+    """Escolhe quais (video_path, start, end) vão para o analyze_scene.
+
+    Descarta as cenas inutilizáveis (curtas, escuras, desfocadas) e, se
+    `margin` > 0, mantém das restantes só as `selection_count * margin`
+    melhores pelo score barato. Retorna (índices dos candidatos,
+    {índice: motivo do descarte}).
+    """
+    rejected = {}
+    ranked = []
+    cap = None
+    cap_path = None
+
+    for idx, (video_path, start, end) in enumerate(tasks):
+        metrics = None
+        if end - start >= PREFILTER_MIN_DURATION:
+            if video_path != cap_path:
+                if cap is not None:
+                    cap.release()
+                cap = cv2.VideoCapture(video_path)
+                cap_path = video_path
+            metrics = thumbnail_metrics(cap, cap.get(cv2.CAP_PROP_FPS), start, end)
+
+        reason = rejection_reason(end - start, metrics)
+        if reason:
+            rejected[idx] = reason
+        else:
+            ranked.append((cheap_score(metrics), idx))
+
+    if cap is not None:
+        cap.release()
+
+    ranked.sort(reverse=True)
+    if margin > 0:
+        keep = max(selection_count, math.ceil(selection_count * margin))
+        for _, idx in ranked[keep:]:
+            rejected[idx] = "fora dos candidatos"
+        ranked = ranked[:keep]
+
+    candidates = sorted(idx for _, idx in ranked)
+    print(f"🧹 Triagem: {len(candidates)} de {len(tasks)} cenas seguem para a análise completa")
+    return candidates, rejected
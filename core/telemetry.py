@@ -0,0 +1,72 @@
+import json
+import os
+import resource
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+# eventos estruturados (um JSON por linha); TRACE_FILE="" desativa
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join("output", "trace.jsonl"))
+
+_trace_lock = threading.Lock()
+_host = socket.gethostname()
+
+
+def emit(event, **fields):
+    """Acrescenta um evento ao trace (seguro entre threads e processos)"""
+    if not TRACE_FILE:
+        return
+
+    record = {
+        "ts": round(time.time(), 3),
+        "host": _host,
+        "pid": os.getpid(),
+        "event": event,
+        **fields,
+    }
+    line = json.dumps(record, default=float) + "\n"
+
+    with _trace_lock:
+        os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+        # uma escrita por linha em modo append: linhas de processos diferentes não se misturam
+        with open(TRACE_FILE, "a") as f:
+            f.write(line)
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+@contextmanager
+def stage(name, **fields):
+    """Mede uma etapa e emite `stage_start`/`stage_end`.
+
+    O bloco recebe um dict de métricas para preencher (frames_decoded,
+    frames_analyzed, inference_s, ...), que sai junto no `stage_end`.
+    `cpu_s` é a CPU do processo inteiro (todas as threads); `ffmpeg_cpu_s`
+    soma os subprocessos encerrados durante a etapa.
+    """
+    metrics = {}
+    emit("stage_start", stage=name, **fields)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    children_start = _children_cpu()
+    status = "ok"
+    try:
+        yield metrics
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        emit(
+            "stage_end",
+            stage=name,
+            status=status,
+            wall_s=round(time.perf_counter() - wall_start, 3),
+            cpu_s=round(time.process_time() - cpu_start, 3),
+            ffmpeg_cpu_s=round(_children_cpu() - children_start, 3),
+            **fields,
+            **metrics,
+        )
@@ -0,0 +1,60 @@
+import bisect
+
+from core.media_probe import probe_video
+
+
+class Segment:
+    def __init__(self, path, offset, duration):
+        self.path = path
+        self.offset = offset
+        self.duration = duration
+
+    @property
+    def end(self):
+        return self.offset + self.duration
+
+
+class VirtualTimeline:
+    """Linha do tempo global sobre os vídeos normalizados, sem gerar merged.mp4.
+
+    Cada arquivo ocupa [offset, offset + duração) na linha do tempo; tempos
+    globais são convertidos em (arquivo, tempo local) para análise e cortes.
+    """
+
+    def __init__(self, video_paths, durations=None):
+        self.segments = []
+        offset = 0.0
+        for idx, path in enumerate(video_paths):
+            if durations is not None:
+                duration = durations[idx]
+            else:
+                info = probe_video(path)
+                duration = info["duration"] if info else 0.0
+            self.segments.append(Segment(path, offset, duration))
+            offset += duration
+
+        self._offsets = [s.offset for s in self.segments]
+
+    @property
+    def duration(self):
+        return self.segments[-1].end if self.segments else 0.0
+
+    @property
+    def paths(self):
+        return [s.path for s in self.segments]
+
+    def segment_at(self, t):
+        idx = bisect.bisect_right(self._offsets, t) - 1
+        return self.segments[max(0, idx)]
+
+    def locate(self, t):
+        """Tempo global → (arquivo, tempo local)"""
+        segment = self.segment_at(t)
+        return segment.path, t - segment.offset
+
+    def to_global(self, path, local_t):
+        """(arquivo, tempo local) → tempo global"""
+        for segment in self.segments:
+            if segment.path == path:
+                return segment.offset + local_t
+        raise KeyError(f"{path} não faz parte da linha do tempo")
@@ -1,15 +1,30 @@
+import json
+import multiprocessing
 import os
+import queue
 import subprocess
+import time
 import uuid
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-from core.scene_detection import detect_scenes
+from core.scene_detection import detect_scenes_many
 #from core.motion_analysis import calculate_motion_score
 from core.highlight_builder import (
-    build_highlight, export_vertical, run_ffmpeg,
-    FFMPEG_CODEC, FFMPEG_HWACCEL_ARGS, get_encoding_args
+    build_highlight, render_from_edl, run_ffmpeg,
+    ffmpeg_codec, hwaccel_args
+)
+from core.encoder_profiles import encoding_args
+from core.media_probe import probe_video
+from core.pipeline import (
+    DONE, PIPELINE, PIPELINE_QUEUE_SIZE, SpeculativeRenderer, StageFailure, drain, run_stage
+)
+from core.resources import configure_threads, encoder_thread_args, ffmpeg_thread_args, slot, thread_allocation
+from core.scene_prefilter import PREFILTER, prefilter_scenes
+from core.telemetry import stage
+from core.timeline import VirtualTimeline
+from core.intelligent_analysis import (
+    analyze_video, init_scoring_worker, score_scene_task, set_analysis_threads
 )
-from core.intelligent_analysis import analyze_scene
 
 # ------------------------------------------------------------------
 # Usar configuração de encoder de highlight_builder (com fallback automático)
@@ -19,37 +34,123 @@ INPUT_FOLDER = "input"
 NORMALIZED_FOLDER = "normalized"
 OUTPUT_FOLDER = "output"
 
-os.makedirs(NORMALIZED_FOLDER, exist_ok=True)
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+# "single_pass": um único decode alimenta detecção de cenas e análise
+# "per_scene": fluxo antigo, detect_scenes + analyze_scene por cena
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "single_pass")
+
+# MERGE_VIDEOS=1 volta a gerar normalized/merged.mp4; por padrão os arquivos
+# normalizados formam uma linha do tempo virtual e são analisados em paralelo
+MERGE_VIDEOS = os.getenv("MERGE_VIDEOS", "0") == "1"
+
+# execução do modo per_scene: "thread" (padrão) ou "process" (um YOLO por worker)
+SCORING_EXECUTOR = os.getenv("SCORING_EXECUTOR", "thread")
+# 0 = definido pelo orçamento de núcleos (core.resources.configure_threads)
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "0")) or None
+# threads de torch/OpenCV por worker; 0 = definido pelo orçamento de núcleos
+SCORING_WORKER_THREADS = int(os.getenv("SCORING_WORKER_THREADS", "0")) or None
+
+# DRAFT=1: prévia rápida (stream copy, sem LUT) + EDL para o render final;
+# RENDER_FROM_EDL=output/highlight_draft.edl.json renderiza só a EDL salva
+DRAFT = os.getenv("DRAFT", "0") == "1"
+RENDER_FROM_EDL = os.getenv("RENDER_FROM_EDL")
+
+# WATCH=1: processo contínuo que observa INPUT_FOLDER e só processa o que chegou
+WATCH = os.getenv("WATCH", "0") == "1"
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", "30"))
+WATCH_STATE_PATH = os.path.join(NORMALIZED_FOLDER, "watch_state.json")
+
+# normalização: ffmpegs simultâneos e formato alvo
+NORMALIZE_JOBS = int(os.getenv("NORMALIZE_JOBS", "2"))
+TARGET_WIDTH, TARGET_HEIGHT, TARGET_FPS = 1920, 1080, 30
 
 
-def normalize_video(input_path):
+def source_signature(path):
+    stat = os.stat(path)
+    return {"source": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def is_conformant(info):
+    """Já está em h264 1920x1080 30fps yuv420p? Então basta remuxar"""
+    return (
+        info is not None
+        and info["codec"] == "h264"
+        and (info["width"], info["height"]) == (TARGET_WIDTH, TARGET_HEIGHT)
+        and abs(info["fps"] - TARGET_FPS) < 0.01
+        and info["pix_fmt"] == "yuv420p"
+    )
+
+
+def normalize_video(input_path, normalized_folder=None):
     filename = os.path.splitext(os.path.basename(input_path))[0]
-    output_path = os.path.join(NORMALIZED_FOLDER, f"{filename}.mp4")
+    output_path = os.path.join(normalized_folder or NORMALIZED_FOLDER, f"{filename}.mp4")
+    # registro da origem ao lado da saída: permite reaproveitar em outra execução
+    signature_path = f"{output_path}.source.json"
 
-    print(f"🔄 Normalizando {input_path} → {output_path}")
-    # usar todos os núcleos disponíveis e, se habilitado, HW accel
-    command = [
-        "ffmpeg",
-        "-threads", "0",
-        "-y",
-        *FFMPEG_HWACCEL_ARGS,
-        "-i", input_path,
-        "-vf", "scale=1920:1080",
-        "-r", "30",
-        "-c:v", FFMPEG_CODEC,
-        *get_encoding_args(FFMPEG_CODEC),
-        output_path
-    ]
+    signature = source_signature(input_path)
+    if os.path.exists(output_path) and os.path.exists(signature_path):
+        with open(signature_path) as f:
+            if json.load(f) == signature:
+                print(f"♻️  Reaproveitando {output_path} (origem inalterada)")
+                return output_path
+
+    remux = is_conformant(probe_video(input_path))
+    if remux:
+        print(f"📦 Remuxando {input_path} → {output_path} (já está em {TARGET_WIDTH}x{TARGET_HEIGHT}@{TARGET_FPS})")
+        command = [
+            "ffmpeg",
+            "-y",
+            "-i", input_path,
+            "-c:v", "copy",
+            output_path
+        ]
+    else:
+        print(f"🔄 Normalizando {input_path} → {output_path}")
+        # usar todos os núcleos disponíveis e, se habilitado, HW accel
+        command = [
+            "ffmpeg",
+            *ffmpeg_thread_args(),
+            "-y",
+            *hwaccel_args(),
+            "-i", input_path,
+            "-vf", f"scale={TARGET_WIDTH}:{TARGET_HEIGHT}",
+            "-r", str(TARGET_FPS),
+            "-c:v", ffmpeg_codec(),
+            *encoding_args(ffmpeg_codec(), "intermediate"),
+            *encoder_thread_args(),
+            output_path
+        ]
+
+    with slot("io" if remux else "encode", video=input_path):
+        run_ffmpeg(command, description=f"normalizing {input_path}")
+
+    with open(signature_path, "w") as f:
+        json.dump(signature, f)
 
-    run_ffmpeg(command, description=f"normalizing {input_path}")
     print(f"✅ Normalização concluída: {output_path}")
     return output_path
 
 
+def list_inputs(input_folder):
+    return [
+        os.path.join(input_folder, file)
+        for file in sorted(os.listdir(input_folder))
+        if file.lower().endswith((".mov", ".mp4"))
+    ]
+
+
+def normalize_many(inputs, normalized_folder=None):
+    """Normaliza `inputs` com até NORMALIZE_JOBS ffmpegs simultâneos"""
+    with ThreadPoolExecutor(max_workers=max(1, NORMALIZE_JOBS)) as executor:
+        return list(executor.map(lambda path: normalize_video(path, normalized_folder), inputs))
+
+
+def normalize_all(input_folder, normalized_folder=None):
+    return normalize_many(list_inputs(input_folder), normalized_folder)
+
+
 def concatenate_all_videos(video_list, output_path):
     print(f"🧩 Concatenando {len(video_list)} vídeos em {output_path}")
-    list_file = os.path.join(NORMALIZED_FOLDER, "all_videos.txt")
+    list_file = f"{os.path.splitext(output_path)[0]}_list.txt"
 
     with open(list_file, "w") as f:
         for video in video_list:
@@ -58,8 +159,8 @@ def concatenate_all_videos(video_list, output_path):
     command = [
         "ffmpeg",
         "-y",
-        "-threads", "0",
-        *FFMPEG_HWACCEL_ARGS,
+        *ffmpeg_thread_args(),
+        *hwaccel_args(),
         "-f", "concat",
         "-safe", "0",
         "-i", list_file,
@@ -67,61 +168,399 @@ def concatenate_all_videos(video_list, output_path):
         output_path
     ]
 
-    run_ffmpeg(command, description="concatenating all videos")
+    with slot("io"):
+        run_ffmpeg(command, description="concatenating all videos")
     os.remove(list_file)
     print("✅ Vídeos concatenados com sucesso")
 
 
-def main():
-    print("Normalizando vídeos...")
+def configure_thread_budget(report=True):
+    """Divide os núcleos entre normalização/render e análise (ver core.resources)"""
+    return configure_threads(
+        encode_jobs=NORMALIZE_JOBS,
+        analysis_workers=SCORING_WORKERS,
+        worker_threads=SCORING_WORKER_THREADS,
+        report=report,
+    )
 
-    normalized_videos = []
 
-    for file in os.listdir(INPUT_FOLDER):
-        if file.lower().endswith((".mov", ".mp4")):
-            input_path = os.path.join(INPUT_FOLDER, file)
-            normalized = normalize_video(input_path)
-            normalized_videos.append(normalized)
+def make_scoring_executor():
+    workers = thread_allocation("analysis_workers")
+    threads = thread_allocation("analysis_threads")
+    if SCORING_EXECUTOR == "process":
+        print(f"🧵 Pool de {workers} processos ({threads} thread(s) cada)")
+        # spawn: cada worker cria seu próprio YOLO (torch não é seguro com fork)
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_scoring_worker,
+            initargs=(threads,),
+        )
+    set_analysis_threads(threads)
+    return ThreadPoolExecutor(max_workers=workers)
 
-    print("Concatenando todos os vídeos...")
-    merged_video = os.path.join(NORMALIZED_FOLDER, "merged.mp4")
-    concatenate_all_videos(normalized_videos, merged_video)
 
+def score_scenes_per_scene(timeline):
     print("🔍 Detectando cenas…")
-    scenes = detect_scenes(merged_video)
+    per_file = detect_scenes_many(timeline.paths)
+
+    tasks = []
+    scenes = []
+    for segment, file_scenes in zip(timeline.segments, per_file):
+        for start, end in file_scenes:
+            tasks.append((segment.path, start, end))
+            scenes.append((segment.offset + start, segment.offset + end))
     print(f"⚙️ {len(scenes)} cenas encontradas")
 
+    candidates = list(range(len(tasks)))
+    rejected = {}
+    if PREFILTER:
+        with stage("prefilter", scenes=len(tasks)) as metrics:
+            candidates, rejected = prefilter_scenes(tasks, top_count(len(tasks)))
+            metrics["candidates"] = len(candidates)
+
+    # descartadas na triagem ficam com -inf: entram na contagem dos 20% e o
+    # select_top as exclui da seleção
+    scores = {idx: float("-inf") for idx in rejected}
+    # o render reaproveita o movimento medido aqui em vez de recalcular
+    camera_motion = {}
+    # análise em paralelo para aproveitar múltiplos cores/GPU; map devolve
+    # os resultados na ordem em que as cenas foram submetidas
+    with make_scoring_executor() as executor:
+        results = executor.map(score_scene_task, [tasks[idx] for idx in candidates])
+        for n, (idx, (score, camera, error)) in enumerate(zip(candidates, results), start=1):
+            start, end = scenes[idx]
+            if camera is not None:
+                camera_motion[(start, end)] = camera
+            if error:
+                print(f"   erro ao avaliar cena {start:.2f}-{end:.2f}: {error}")
+            print(f"   Avaliando cena {n}/{len(candidates)} ({start:.2f}s-{end:.2f}s) → score={score:.1f}")
+            scores[idx] = score
+
+    for idx, reason in sorted(rejected.items()):
+        start, end = scenes[idx]
+        print(f"   Cena {start:.2f}s-{end:.2f}s descartada na triagem: {reason}")
+
+    return [(start, end, scores[idx]) for idx, (start, end) in enumerate(scenes)], camera_motion
+
+
+def analyze_files(paths):
+    """Análise de passada única por arquivo, arquivos em paralelo (tempos locais)"""
+    with make_scoring_executor() as executor:
+        return list(executor.map(analyze_video, paths))
+
+
+def place_on_timeline(timeline, per_file):
+    """Converte as cenas de cada arquivo para tempos globais da linha do tempo.
+
+    Retorna (scored, camera_motion, subject_tracks), os dois últimos
+    indexados por (start, end) global.
+    """
+    analyzed = []
+    for segment, file_scenes in zip(timeline.segments, per_file):
+        for stats in file_scenes:
+            analyzed.append(dict(
+                stats,
+                start=stats["start"] + segment.offset,
+                end=stats["end"] + segment.offset,
+            ))
+    print(f"⚙️ {len(analyzed)} cenas encontradas")
+
     scored = []
-    # análise em paralelo para aproveitar múltiplos cores/GPU
-    with ThreadPoolExecutor() as executor:
-        future_to_scene = {
-            executor.submit(analyze_scene, merged_video, start, end): (start, end)
-            for (start, end) in scenes
-        }
-        for idx, future in enumerate(as_completed(future_to_scene), start=1):
-            start, end = future_to_scene[future]
-            try:
-                score = future.result()
-            except Exception as e:
-                print(f"   erro ao avaliar cena {start:.2f}-{end:.2f}: {e}")
-                score = 0
-            print(f"   Avaliando cena {idx}/{len(scenes)} ({start:.2f}s-{end:.2f}s) → score={score:.1f}")
-            scored.append((start, end, score))
-        
-    scored.sort(key=lambda x: x[2], reverse=True)
-    top = scored[:max(1, int(len(scored) * 0.2))]
+    camera_motion = {}
+    subject_tracks = {}
+    for idx, stats in enumerate(analyzed, start=1):
+        start, end, score = stats["start"], stats["end"], stats["score"]
+        print(f"   Avaliando cena {idx}/{len(analyzed)} ({start:.2f}s-{end:.2f}s) → score={score:.1f}")
+        scored.append((start, end, score))
+        camera_motion[(start, end)] = (stats["cam_motion"], stats["cam_instability"])
+        if "subject_x" in stats:
+            subject_tracks[(start, end)] = stats["subject_x"]
+
+    return scored, camera_motion, subject_tracks
+
+
+def score_scenes_single_pass(timeline):
+    """Um decode por arquivo normalizado, arquivos em paralelo; tempos globais"""
+    print(f"🔍 Detectando e avaliando cenas em uma única leitura ({len(timeline.segments)} arquivo(s))…")
+    return place_on_timeline(timeline, analyze_files(timeline.paths))
+
+
+def top_count(scene_count):
+    """Quantas cenas entram no highlight (top 20%)"""
+    return max(1, int(scene_count * 0.2))
+
+
+def select_top(scored):
+    scored = sorted(scored, key=lambda x: x[2], reverse=True)
+    # cenas descartadas na triagem (-inf) contam nos 20% mas nunca entram
+    top = [s for s in scored[:top_count(len(scored))] if s[2] != float("-inf")]
     selected = [(s[0], s[1]) for s in top]
     print(f"✅ Selecionadas {len(selected)} cenas para highlight")
+    return selected
+
+
+def highlight_output_path(output_folder=None):
+    highlight_name = "highlight_draft.mp4" if DRAFT else "highlight_horizontal.mp4"
+    return os.path.join(output_folder or OUTPUT_FOLDER, highlight_name)
+
+
+# =====================================================
+# MODO WATCH (processamento incremental)
+# =====================================================
+
+def load_watch_state():
+    if os.path.exists(WATCH_STATE_PATH):
+        with open(WATCH_STATE_PATH) as f:
+            return json.load(f)
+    return {"files": {}, "selection": None}
 
-    highlight_path = os.path.join(OUTPUT_FOLDER, "highlight_horizontal.mp4")
-    build_highlight(merged_video, selected, highlight_path)
 
-    #vertical_path = os.path.join(OUTPUT_FOLDER, "highlight_tiktok_9x16.mp4")
-    #export_vertical(highlight_path, vertical_path)
-    print("📁 Todos os arquivos foram gerados em", OUTPUT_FOLDER)
+def save_watch_state(state):
+    tmp_path = f"{WATCH_STATE_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, WATCH_STATE_PATH)
+
+
+def watch_cycle(state, last_sizes):
+    """Processa arquivos novos/alterados; refaz o highlight se a seleção mudar"""
+    inputs = list_inputs(INPUT_FOLDER)
+    files = state["files"]
+
+    removed = [path for path in files if path not in inputs]
+    for path in removed:
+        print(f"🗑  {path} removido da pasta de entrada")
+        del files[path]
+
+    arrived = []
+    for path in inputs:
+        signature = source_signature(path)
+        known = files.get(path)
+        if known and known["signature"] == signature:
+            continue
+        # arquivo ainda sendo copiado: espera o tamanho repetir entre duas verificações
+        if last_sizes.get(path) != signature["size"]:
+            last_sizes[path] = signature["size"]
+            continue
+        arrived.append(path)
+
+    if not arrived and not removed:
+        return
+
+    if arrived:
+        print(f"📥 {len(arrived)} arquivo(s) novo(s) em {INPUT_FOLDER}")
+        normalized = normalize_many(arrived)
+        per_file = analyze_files(normalized)
+        for path, normalized_path, scenes in zip(arrived, normalized, per_file):
+            info = probe_video(normalized_path)
+            files[path] = {
+                "signature": source_signature(path),
+                "normalized": normalized_path,
+                "duration": info["duration"] if info else 0.0,
+                "scenes": scenes,
+            }
+            last_sizes.pop(path, None)
+
+    save_watch_state(state)
+
+    ordered = [files[path] for path in inputs if path in files]
+    if not ordered:
+        return
+
+    timeline = VirtualTimeline(
+        [f["normalized"] for f in ordered],
+        durations=[f["duration"] for f in ordered],
+    )
+    scored, camera_motion, subject_tracks = place_on_timeline(timeline, [f["scenes"] for f in ordered])
+    selected = select_top(scored)
+
+    # seleção identificada por (arquivo, início local, duração): não muda só
+    # porque um arquivo novo deslocou a linha do tempo
+    selection = []
+    for start, end in selected:
+        path, local_start = timeline.locate(start)
+        selection.append([path, round(local_start, 3), round(end - start, 3)])
+
+    if selection == state.get("selection"):
+        print("✔ Seleção de cenas inalterada — highlight mantido")
+        return
+
+    build_highlight(
+        timeline, selected, highlight_output_path(),
+        camera_motion=camera_motion, subject_tracks=subject_tracks, draft=DRAFT
+    )
+    state["selection"] = selection
+    save_watch_state(state)
+
+
+def watch():
+    print(f"👀 Observando {INPUT_FOLDER} a cada {WATCH_INTERVAL:.0f}s (Ctrl+C para sair)")
+    state = load_watch_state()
+    last_sizes = {}
+
+    try:
+        while True:
+            try:
+                watch_cycle(state, last_sizes)
+            except Exception as e:
+                print(f"⚠️  Erro no ciclo de processamento: {e}")
+            time.sleep(WATCH_INTERVAL)
+    except KeyboardInterrupt:
+        print("👋 Encerrando modo watch")
+
+
+def main():
+    # criadas aqui e não no import: benchmarks e o agendador importam este módulo
+    os.makedirs(NORMALIZED_FOLDER, exist_ok=True)
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+
+    if RENDER_FROM_EDL:
+        highlight_path = os.path.join(OUTPUT_FOLDER, "highlight_horizontal.mp4")
+        render_from_edl(RENDER_FROM_EDL, highlight_path)
+        print("Finalizado com sucesso 🚀")
+        return
+
+    configure_thread_budget()
+
+    if WATCH:
+        watch()
+        return
+
+    process_shoot(INPUT_FOLDER, NORMALIZED_FOLDER, OUTPUT_FOLDER)
 
     print("Finalizado com sucesso 🚀")
 
 
+def process_shoot(input_folder, normalized_folder, output_folder):
+    """Pipeline completo de uma filmagem; retorna o caminho do highlight.
+
+    As pastas são parâmetros para o agendador rodar várias filmagens no
+    mesmo processo, cada uma no seu workspace. Cada etapa ocupa uma vaga do
+    recurso que usa (core.resources): análise em "analysis", render em
+    "encode" (ou "io" na prévia em stream copy).
+    """
+    os.makedirs(normalized_folder, exist_ok=True)
+    os.makedirs(output_folder, exist_ok=True)
+
+    # o fluxo sobreposto depende de arquivos analisados de forma independente
+    if PIPELINE == "streaming" and ANALYSIS_MODE != "per_scene" and not MERGE_VIDEOS:
+        return process_shoot_streaming(input_folder, normalized_folder, output_folder)
+
+    print("Normalizando vídeos...")
+
+    with stage("normalize", input=input_folder) as metrics:
+        normalized_videos = normalize_all(input_folder, normalized_folder)
+        metrics["files"] = len(normalized_videos)
+
+    if MERGE_VIDEOS:
+        print("Concatenando todos os vídeos...")
+        merged_video = os.path.join(normalized_folder, "merged.mp4")
+        with stage("concatenate"):
+            concatenate_all_videos(normalized_videos, merged_video)
+        timeline = VirtualTimeline([merged_video])
+    else:
+        timeline = VirtualTimeline(normalized_videos)
+        print(f"🧭 Linha do tempo virtual: {len(timeline.segments)} arquivo(s), {timeline.duration:.1f}s")
+
+    camera_motion = {}
+    subject_tracks = {}
+    with slot("analysis", input=input_folder), stage("analysis", mode=ANALYSIS_MODE) as metrics:
+        if ANALYSIS_MODE == "per_scene":
+            scored, camera_motion = score_scenes_per_scene(timeline)
+        else:
+            scored, camera_motion, subject_tracks = score_scenes_single_pass(timeline)
+        metrics["scenes"] = len(scored)
+
+    selected = select_top(scored)
+
+    highlight_path = highlight_output_path(output_folder)
+    with slot("io" if DRAFT else "encode", input=input_folder), \
+            stage("build_highlight", scenes=len(selected), draft=DRAFT):
+        build_highlight(
+            timeline, selected, highlight_path,
+            camera_motion=camera_motion, subject_tracks=subject_tracks, draft=DRAFT
+        )
+
+    print("📁 Todos os arquivos foram gerados em", output_folder)
+    return highlight_path
+
+
+
+def process_shoot_streaming(input_folder, normalized_folder, output_folder):
+    """Mesmo resultado do process_shoot, com as etapas sobrepostas.
+
+    Cada arquivo segue sozinho por filas limitadas: normalizado → analisado
+    (detecção de cenas + score numa passada) → cenas no top provisório
+    codificadas no cache de clipes (RENDER_MODE=cached). Enquanto um arquivo
+    é analisado o próximo já está sendo normalizado e as melhores cenas já
+    estão sendo codificadas. A seleção final só é feita quando todos os
+    arquivos terminaram.
+    """
+    inputs = list_inputs(input_folder)
+    print(f"🚰 Pipeline em fluxo: {len(inputs)} arquivo(s)")
+
+    pending = queue.Queue()
+    for item in enumerate(inputs):
+        pending.put(item)
+    pending.put(DONE)
+    normalized = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    analyzed = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    def normalize_item(item):
+        idx, path = item
+        return idx, normalize_video(path, normalized_folder)
+
+    run_stage(normalize_item, pending, normalized, NORMALIZE_JOBS, name="normalize")
+
+    normalized_paths = [None] * len(inputs)
+    per_file = [None] * len(inputs)
+    failures = []
+    speculative = SpeculativeRenderer(top_count, enabled=not DRAFT)
+
+    with make_scoring_executor() as executor, stage("pipeline", files=len(inputs)) as metrics:
+        def analyze_item(item):
+            # vaga por arquivo, só quando ele já está normalizado: uma filmagem
+            # esperando I/O ou normalização não segura a análise das outras
+            idx, path = item
+            with slot("analysis", input=input_folder, video=path):
+                return idx, path, executor.submit(analyze_video, path).result()
+
+        run_stage(analyze_item, normalized, analyzed, thread_allocation("analysis_workers"), name="analysis")
+
+        for done, result in enumerate(drain(analyzed), start=1):
+            if isinstance(result, StageFailure):
+                failures.append(result)
+                continue
+            idx, path, scenes = result
+            normalized_paths[idx] = path
+            per_file[idx] = scenes
+            print(f"📼 {done}/{len(inputs)} {os.path.basename(path)}: {len(scenes)} cena(s) analisadas")
+            speculative.add(path, scenes)
+
+        speculative.finish()
+        metrics["scenes"] = sum(len(scenes) for scenes in per_file if scenes)
+        metrics["speculative_clips"] = speculative.encoded
+
+    if failures:
+        raise failures[0].error
+
+    timeline = VirtualTimeline(normalized_paths)
+    print(f"🧭 Linha do tempo virtual: {len(timeline.segments)} arquivo(s), {timeline.duration:.1f}s")
+    scored, camera_motion, subject_tracks = place_on_timeline(timeline, per_file)
+    selected = select_top(scored)
+
+    highlight_path = highlight_output_path(output_folder)
+    with slot("io" if DRAFT else "encode", input=input_folder), \
+            stage("build_highlight", scenes=len(selected), draft=DRAFT):
+        build_highlight(
+            timeline, selected, highlight_path,
+            camera_motion=camera_motion, subject_tracks=subject_tracks, draft=DRAFT
+        )
+
+    print("📁 Todos os arquivos foram gerados em", output_folder)
+    return highlight_path
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
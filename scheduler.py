@@ -0,0 +1,233 @@
+"""Fila de filmagens: várias execuções do pipeline no mesmo processo.
+
+Cada job ganha um workspace próprio (jobs/<id>/input, normalized, output) e
+as etapas disputam vagas separadas de encode, análise e I/O (core.resources),
+então a análise de uma filmagem roda enquanto outra está no render.
+
+Uso (na raiz do repositório):
+    python scheduler.py /shoots/casamento /shoots/praia   # enfileira e espera
+    python scheduler.py --serve                          # API HTTP local
+
+API (127.0.0.1:SCHEDULER_PORT):
+    POST /jobs        {"source": "/shoots/praia", "name": "praia"}
+    GET  /jobs        lista os jobs
+    GET  /jobs/<id>   estado de um job
+    GET  /slots       vagas por recurso
+"""
+import argparse
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import main
+from core.resources import RESOURCE_SLOTS, configure_slots, slot
+from core.telemetry import emit
+
+JOBS_FOLDER = os.getenv("JOBS_FOLDER", "jobs")
+# filmagens em andamento ao mesmo tempo (as etapas ainda esperam pelas vagas)
+MAX_ACTIVE_JOBS = int(os.getenv("MAX_ACTIVE_JOBS", "4"))
+SCHEDULER_PORT = int(os.getenv("SCHEDULER_PORT", "8765"))
+
+# vagas usadas pelo agendador quando ENCODE_SLOTS/ANALYSIS_SLOTS/IO_SLOTS não estão definidos
+DEFAULT_SLOTS = {"encode": 2, "analysis": 1, "io": 2}
+
+
+def link_inputs(source_folder, input_folder):
+    """Coloca os vídeos da filmagem no workspace (symlink; cópia se não der)"""
+    for path in main.list_inputs(source_folder):
+        target = os.path.join(input_folder, os.path.basename(path))
+        if os.path.lexists(target):
+            continue
+        try:
+            os.symlink(os.path.abspath(path), target)
+        except OSError:
+            shutil.copy2(path, target)
+
+
+class JobScheduler:
+    """Fila de jobs atendida por `workers` threads.
+
+    O estado de cada job fica em memória e em <workspace>/job.json.
+    """
+
+    def __init__(self, root=JOBS_FOLDER, workers=MAX_ACTIVE_JOBS):
+        self.root = os.path.abspath(root)
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.pending = queue.Queue()
+        for _ in range(max(1, workers)):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, source, name=None):
+        if not os.path.isdir(source):
+            raise ValueError(f"Pasta da filmagem não encontrada: {source}")
+
+        job_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        job = {
+            "id": job_id,
+            "name": name or os.path.basename(os.path.abspath(source)),
+            "source": os.path.abspath(source),
+            "workspace": os.path.join(self.root, job_id),
+            "status": "queued",
+            "submitted": time.time(),
+            "highlight": None,
+            "error": None,
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+            self._save(job)
+
+        self.pending.put(job_id)
+        print(f"📋 Job {job_id} enfileirado ({job['name']})")
+        return dict(job)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self):
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def wait(self):
+        self.pending.join()
+
+    def _save(self, job):
+        os.makedirs(job["workspace"], exist_ok=True)
+        path = os.path.join(job["workspace"], "job.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(job, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def _update(self, job, **fields):
+        with self.lock:
+            job.update(fields)
+            self._save(job)
+
+    def _worker(self):
+        while True:
+            job_id = self.pending.get()
+            try:
+                self._run(self.jobs[job_id])
+            finally:
+                self.pending.task_done()
+
+    def _run(self, job):
+        folders = [os.path.join(job["workspace"], name) for name in ("input", "normalized", "output")]
+        for folder in folders:
+            os.makedirs(folder, exist_ok=True)
+
+        self._update(job, status="running", started=time.time())
+        emit("job_start", job=job["id"], source=job["source"])
+        print(f"🚚 Job {job['id']} ({job['name']}) iniciado")
+
+        try:
+            with slot("io", job=job["id"]):
+                link_inputs(job["source"], folders[0])
+            highlight = main.process_shoot(*folders)
+        except Exception as e:
+            self._update(job, status="failed", error=str(e), finished=time.time())
+            emit("job_end", job=job["id"], status="failed", error=str(e))
+            print(f"❌ Job {job['id']} falhou: {e}")
+            return
+
+        self._update(job, status="done", highlight=highlight, finished=time.time())
+        emit("job_end", job=job["id"], status="done", wall_s=round(job["finished"] - job["started"], 3))
+        print(f"✅ Job {job['id']} concluído → {highlight}")
+
+
+def make_handler(scheduler):
+    class JobAPIHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload, indent=2).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = [p for p in self.path.split("/") if p]
+            if parts == ["jobs"]:
+                return self._reply(200, scheduler.list())
+            if parts == ["slots"]:
+                return self._reply(200, RESOURCE_SLOTS)
+            if len(parts) == 2 and parts[0] == "jobs":
+                job = scheduler.get(parts[1])
+                if job:
+                    return self._reply(200, job)
+            self._reply(404, {"error": "não encontrado"})
+
+        def do_POST(self):
+            if [p for p in self.path.split("/") if p] != ["jobs"]:
+                return self._reply(404, {"error": "não encontrado"})
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("o corpo deve ser um objeto JSON")
+                job = scheduler.submit(payload["source"], payload.get("name"))
+            except (ValueError, KeyError, TypeError) as e:
+                return self._reply(400, {"error": f"pedido inválido: {e}"})
+            self._reply(201, job)
+
+        def log_message(self, format, *args):
+            print(f"🌐 {self.address_string()} {format % args}")
+
+    return JobAPIHandler
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="*", help="pastas de filmagens para enfileirar")
+    parser.add_argument("--serve", action="store_true", help="mantém a API HTTP local no ar")
+    parser.add_argument("--port", type=int, default=SCHEDULER_PORT)
+    parser.add_argument("--jobs", type=int, default=MAX_ACTIVE_JOBS, help="filmagens em andamento ao mesmo tempo")
+    parser.add_argument("--workspace", default=JOBS_FOLDER, help="pasta dos workspaces dos jobs")
+    for name in DEFAULT_SLOTS:
+        parser.add_argument(f"--{name}-slots", type=int, default=None,
+                            help=f"vagas de {name} (padrão {DEFAULT_SLOTS[name]})")
+    args = parser.parse_args()
+
+    if not args.sources and not args.serve:
+        parser.error("informe pastas de filmagens ou use --serve")
+
+    configure_slots(**{
+        name: getattr(args, f"{name}_slots") or RESOURCE_SLOTS[name] or default
+        for name, default in DEFAULT_SLOTS.items()
+    })
+    print(f"🎛  Vagas: {', '.join(f'{k}={v}' for k, v in RESOURCE_SLOTS.items())} | jobs simultâneos: {args.jobs}")
+    # threads por ffmpeg/worker dependem das vagas recém-definidas
+    main.configure_thread_budget()
+
+    scheduler = JobScheduler(args.workspace, args.jobs)
+    for source in args.sources:
+        scheduler.submit(source)
+
+    if args.serve:
+        server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(scheduler))
+        print(f"🌐 API de jobs em http://127.0.0.1:{args.port}/jobs (Ctrl+C para sair)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("👋 Encerrando agendador")
+        finally:
+            server.server_close()
+        return 0
+
+    scheduler.wait()
+    failed = [job for job in scheduler.list() if job["status"] != "done"]
+    for job in scheduler.list():
+        print(f"   {job['status']:>6}  {job['name']}  {job['highlight'] or job['error']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from core.decode_engine import StreamingDecoder
+from core.intelligent_analysis import SCORE_WEIGHTS, best_windows, frame_score_column
+
+FPS = 30
+WINDOW = 4.0
+LONG_SCENE = 10.0
+
+
+class FakeDecoder:
+    """Colunas aleatórias no lugar da decodificação, com quadros não amostrados (NaN)"""
+
+    frame_range = StreamingDecoder.frame_range
+
+    def __init__(self, frame_count, seed=3, flow_std=True):
+        rng = np.random.default_rng(seed)
+        self.fps = FPS
+        self.frame_count = frame_count
+        self.calls = 0
+        self._columns = {
+            "sharpness": rng.uniform(0, 500, frame_count),
+            "brightness": rng.uniform(0, 255, frame_count),
+            "people": rng.integers(0, 4, frame_count).astype(np.float64),
+            "frame_diff": rng.uniform(0, 40, frame_count),
+        }
+        if flow_std:
+            self._columns["flow_std"] = rng.uniform(0, 3, frame_count)
+        for column in self._columns.values():
+            column[rng.random(frame_count) < 0.3] = np.nan
+
+    def columns(self):
+        self.calls += 1
+        return self._columns
+
+
+def brute_force_window(decoder, start, end, window_frames):
+    """Média do score de cada janela possível, quadro a quadro; a primeira maior vence"""
+    scores = frame_score_column(decoder.columns(), SCORE_WEIGHTS)
+    start_frame, end_frame = decoder.frame_range(start, end)
+    best, best_score = None, -np.inf
+    for first in range(start_frame, end_frame - window_frames + 1):
+        score = sum(scores[first:first + window_frames]) / window_frames
+        if score > best_score:
+            best, best_score = first, score
+    return best / decoder.fps, (best + window_frames) / decoder.fps
+
+
+@pytest.mark.parametrize("flow_std", [True, False])
+def test_best_windows_matches_brute_force(flow_std):
+    decoder = FakeDecoder(FPS * 120, flow_std=flow_std)
+    scenes = [(0.0, 15.0), (15.0, 47.3), (47.3, 60.0), (60.0, 119.9)]
+    window_frames = int(round(WINDOW * FPS))
+
+    windows = best_windows(decoder, scenes, window=WINDOW, long_scene=LONG_SCENE)
+
+    assert len(windows) == len(scenes)
+    for (start, end), (window_start, window_end) in zip(scenes, windows):
+        expected = brute_force_window(decoder, start, end, window_frames)
+        assert window_start == pytest.approx(expected[0])
+        assert window_end == pytest.approx(expected[1])
+        assert start <= window_start and window_end <= end + 1 / FPS
+
+
+def test_short_scenes_pass_through():
+    decoder = FakeDecoder(FPS * 30)
+    scenes = [(0.0, 3.0), (3.0, 12.5), (12.5, 13.0)]
+
+    assert best_windows(decoder, scenes, window=WINDOW, long_scene=LONG_SCENE) == scenes
+    # nenhuma cena longa: as colunas nem são montadas
+    assert decoder.calls == 0
+    assert best_windows(decoder, [(0.0, 29.0)], window=0, long_scene=LONG_SCENE) == [(0.0, 29.0)]
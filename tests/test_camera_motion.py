@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from core.camera_motion_analysis import (
+    SampledCameraMotion, frame_flow_stats, frame_global_motion, motion_from_trajectory, to_analysis_gray
+)
+
+FRAMES = 90
+# limiares do plan_highlight
+SHAKE_REJECT = 3
+STATIC_MOTION = 0.8
+
+
+def synthetic_frames(offsets, seed=1):
+    """Recortes de uma textura fixa deslocados por `offsets` (dx, dy) em cada quadro"""
+    rng = np.random.default_rng(seed)
+    texture = cv2.GaussianBlur(rng.integers(0, 256, (400, 560), dtype=np.uint8), (5, 5), 0)
+    frames = []
+    for dx, dy in offsets:
+        x, y = int(round(40 + dx)), int(round(40 + dy))
+        frames.append(cv2.cvtColor(texture[y:y + 240, x:x + 320], cv2.COLOR_GRAY2BGR))
+    return frames
+
+
+def shaky_offsets(seed=2):
+    """Câmera parada com tremedeira de até ±6 px por quadro"""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-6, 6, (FRAMES, 2))
+
+
+def pan_offsets():
+    """Panorâmica suave de 1 px/quadro"""
+    return np.stack([np.arange(FRAMES) - 40.0, np.zeros(FRAMES)], axis=1)
+
+
+def sampled(frames, estimator, gap):
+    camera = SampledCameraMotion(estimator)
+    for idx in range(0, len(frames) - 1, gap):
+        camera.add(frames[idx], frames[idx + 1], min(gap, len(frames) - idx))
+    return camera.result()
+
+
+def dense(frames, estimator):
+    """Mesmo cálculo do analyze_camera_motion, quadro a quadro"""
+    values = []
+    for prev, frame in zip(frames, frames[1:]):
+        prev_gray, scale = to_analysis_gray(prev)
+        gray, _ = to_analysis_gray(frame)
+        measure = frame_global_motion if estimator == "sparse" else frame_flow_stats
+        values.append(measure(prev_gray, gray, scale))
+    values = np.asarray(values)
+    if estimator == "sparse":
+        return motion_from_trajectory(values[:, 0], values[:, 1])
+    return tuple(values.mean(axis=0))
+
+
+@pytest.mark.parametrize("gap", [1, 8, 15])
+def test_sparse_shake_survives_sampling(gap):
+    cam_motion, cam_instability = sampled(synthetic_frames(shaky_offsets()), "sparse", gap)
+
+    assert cam_instability > SHAKE_REJECT
+    assert not (cam_motion < STATIC_MOTION and cam_instability < 1)
+
+
+@pytest.mark.parametrize("gap", [1, 8, 15])
+def test_farneback_shake_matches_dense(gap):
+    frames = synthetic_frames(shaky_offsets())
+    cam_motion, _ = sampled(frames, "farneback", gap)
+
+    # tremedeira de translação aparece na magnitude média do fluxo
+    assert cam_motion == pytest.approx(dense(frames, "farneback")[0], rel=0.25)
+    assert cam_motion > SHAKE_REJECT
+
+
+@pytest.mark.parametrize("estimator", ["farneback", "sparse"])
+@pytest.mark.parametrize("gap", [1, 8, 15])
+def test_smooth_pan(estimator, gap):
+    cam_motion, cam_instability = sampled(synthetic_frames(pan_offsets()), estimator, gap)
+
+    assert cam_motion == pytest.approx(1.0, abs=0.1)
+    assert cam_instability < 0.5
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("scenedetect")
+
+from scenedetect.frame_timecode import FrameTimecode
+from scenedetect.stats_manager import StatsManager
+
+from core.scene_detection import MIN_SCENE_LEN, content_detector, cuts_from_stats
+
+FPS = 30
+
+
+def synthetic_frames(frame_count=150, size=64, seed=7):
+    """Segmentos com textura própria, cortes próximos (< MIN_SCENE_LEN), um
+    flash de um quadro e um fade, para gerar scores acima e abaixo dos limiares"""
+    rng = np.random.default_rng(seed)
+    boundaries = [0, 20, 27, 50, 52, 95, frame_count]
+    textures = [rng.integers(0, 256, (size, size, 3), dtype=np.uint8) for _ in boundaries[:-1]]
+
+    frames = []
+    for idx in range(frame_count):
+        segment = np.searchsorted(boundaries, idx, side="right") - 1
+        frame = textures[segment].astype(np.int16)
+        frame += rng.integers(-6, 7, frame.shape, dtype=np.int16)
+        if idx == 70:
+            frame = np.full_like(frame, 255)
+        if 110 <= idx < 130:
+            frame = frame * (1 - (idx - 110) / 40)
+        frames.append(np.clip(frame, 0, 255).astype(np.uint8))
+    return frames
+
+
+def live_cuts(frames, threshold, stats_manager=None):
+    detector = content_detector(threshold)
+    if stats_manager is not None:
+        # o que o SceneManager.add_detector faz
+        stats_manager.register_metrics(detector.get_metrics())
+        detector.stats_manager = stats_manager
+    cuts = []
+    for frame_num, frame in enumerate(frames):
+        cuts += detector.process_frame(frame_num, frame)
+    cuts += detector.post_process(len(frames)) or []
+    return cuts
+
+
+@pytest.fixture
+def stats_csv(tmp_path):
+    stats_manager = StatsManager(base_timecode=FrameTimecode(0, fps=FPS))
+    live_cuts(synthetic_frames(), 27.0, stats_manager)
+    path = tmp_path / "video.scenestats.csv"
+    stats_manager.save_to_csv(str(path))
+    return path
+
+
+@pytest.mark.parametrize("threshold", [5.0, 15.0, 27.0, 45.0, 80.0])
+def test_replay_matches_live_detection(stats_csv, threshold):
+    assert cuts_from_stats(stats_csv, threshold) == live_cuts(synthetic_frames(), threshold)
+
+
+def test_close_cuts_are_suppressed(stats_csv):
+    cuts = cuts_from_stats(stats_csv, 27.0)
+    assert cuts
+    assert all(b - a >= MIN_SCENE_LEN for a, b in zip(cuts, cuts[1:]))